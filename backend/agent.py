@@ -1,60 +1,161 @@
-from datetime import datetime
+import contextvars
 import json
 import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pyagentspec.agent import Agent
 from pyagentspec.tools import ServerTool
 from pyagentspec.property import StringProperty
 from pyagentspec.llms.openaiconfig import OpenAiConfig
+from pyagentspec.llms.openaicompatibleconfig import OpenAiCompatibleConfig
 from pyagentspec.serialization import AgentSpecSerializer
 from wayflowcore.agentspec import AgentSpecLoader
-from gradio_client import Client, file
+from gradio_client import file
 from dotenv import load_dotenv
-from tavily import TavilyClient
-import requests
-from bs4 import BeautifulSoup
+
+from audio import prepare_chunks, stitch_transcripts
+from cache import ResultCache, hash_file, make_key
+from clients import CLIENTS_PER_SPACE, SPACES, predict
+from compaction import SOURCE_PAGE_CHARS, ContextCompactor, current_compactor
+from jobs import current_job_id, emit_event, new_job_id
+from metrics import instrument_tool, pop_job_metrics, record_bytes, record_span, record_tokens, span
+from pipeline import run_stages
+from preprocess import preprocess_images
+from projects import (
+    diff_fingerprints, file_fingerprints, load_project, read_project_files, restore_files, save_project,
+    write_project_files,
+)
+from store import latest_competition_analysis, save_competition_analysis
+from textmerge import merge_ocr_texts
+from upstream import acall_upstream, is_available
+from web import SCRAPE_ERROR_PREFIX, fetch_page_text, scrape_many, search_urls
+from workspace import current_workspace, resolve_path
 
 load_dotenv()
 
 
-def extract_handwriting(image_url: str) -> str:
-    print("Extracting handwriting from image")
-    clientOCR = Client("LauzHack/DeepSeek-OCR", token=os.getenv("HF_TOKEN"))
+# DeepSeek-OCR settings, also part of the OCR cache key
+OCR_MODE = "Gundam"  # mode: 'Gundam', 'Tiny', 'Small', 'Base', 'Large'
+OCR_TASK = "📋 Markdown"  # task -> use 'Custom' to respect your prompt
+OCR_PROMPT = "Extract the handwriting, correct typos and provide it in markdown format. Make sure the result makes sense"
+
+# OCR and transcription results keyed by upload content + model parameters,
+# so a resubmitted photo or recording skips the remote model
+ocr_cache = ResultCache("ocr")
+transcript_cache = ResultCache("transcripts")
+
+
+def ocr_cache_key(image_url: str) -> str:
+    return make_key(hash_file(image_url), SPACES["ocr"][0], OCR_MODE, OCR_TASK, OCR_PROMPT)
 
-    input_image = clientOCR.predict(
-        file(image_url),   # file_path
-        1,                  # page_num
-        api_name="/load_image"
-    )
 
-    text, md_text, extra, out_img, gallery = clientOCR.predict(
-        file(input_image),
-        file(image_url),                # file_path: reuse same image as file
-        "Gundam",                                       # mode: 'Gundam', 'Tiny', 'Small', 'Base', 'Large'
-        "📋 Markdown",                                  # task -> use 'Custom' to respect your prompt
-        "Extract the handwriting, correct typos and provide it in markdown format. Make sure the result makes sense",                      # custom_prompt
-        1,                                              # page_num
-        api_name="/run"
+def transcript_cache_key(audio_path: str) -> str:
+    return make_key(hash_file(audio_path), SPACES["whisper"][0], "transcribe")
+
+
+# Opt-in memoization of the LLM stages: the same extracted text gives an
+# equivalent spec, and the same spec the same project
+LLM_CACHE_ENABLED = os.getenv("SPECTER_LLM_CACHE", "").lower() in ("1", "true", "yes")
+LLM_CACHE_TTL_SECONDS = int(os.getenv("SPECTER_LLM_CACHE_TTL", str(7 * 24 * 3600)))
+# Generated projects larger than this are not cached
+MAX_CACHED_PROJECT_BYTES = 8 << 20
+enrich_cache = ResultCache("enrich", max_entries=256, ttl_seconds=LLM_CACHE_TTL_SECONDS)
+# Cached projects carry their files' text: RAM is capped by size too
+creator_cache = ResultCache(
+    "creator", max_entries=64, max_disk_bytes=256 << 20, max_memory_bytes=32 << 20,
+    ttl_seconds=LLM_CACHE_TTL_SECONDS,
+)
+
+
+def _normalize_text(text: str) -> str:
+    return " ".join(text.split())
+
+
+def enrich_cache_key(idea_text: str, audio_text: str) -> str:
+    return make_key(
+        _normalize_text(idea_text), _normalize_text(audio_text),
+        ENRICHER_PROMPT, SPACES["kimi"][0], LLM_MODEL, LLM_URL,
     )
+
+
+def creator_cache_key(spec: str) -> str:
+    return make_key(_normalize_text(spec), CREATOR_PROMPT, LLM_MODEL, LLM_URL)
+
+
+def extract_handwriting(image_url: str) -> str:
+    print("Extracting handwriting from image")
+    key = ocr_cache_key(image_url)
+    cached = ocr_cache.get(key)
+    if cached is not None:
+        print("OCR cache hit")
+        return cached
+
+    record_bytes("ocr", "out", os.path.getsize(image_url))
+    # Inputs are always images (uploads are checked to be), which /run
+    # takes as they are: no /load_image round trip to render a page
+    with span("upstream", "ocr"):
+        text, md_text, extra, out_img, gallery = predict(
+            "ocr",
+            file(image_url),
+            file(image_url),                # file_path: reuse same image as file
+            OCR_MODE,
+            OCR_TASK,
+            OCR_PROMPT,                     # custom_prompt
+            1,                                              # page_num
+            api_name="/run"
+        )
+    ocr_cache.set(key, md_text)
     return md_text
 
 def extract_audio(audio_path: str) -> str:
     print("Extracting audio from file")
-    client = Client("LauzHack/whisper")
     print(audio_path)
     if not file(audio_path):
         return ""
+    key = transcript_cache_key(audio_path)
+    cached = transcript_cache.get(key)
+    if cached is not None:
+        print("Transcript cache hit")
+        return cached
+
     print("Audio file loaded, performing transcription...")
-    result = client.predict(
-        file(audio_path),   
-        "transcribe",
-        api_name="/predict",
-    )
+    # Trimmed 16 kHz mono chunks, transcribed in parallel and stitched
+    # back in order; recordings we can't decode locally go out whole
+    chunks = prepare_chunks(audio_path, f"{audio_path}.chunks")
+    if chunks is None:
+        result = _transcribe_file(audio_path)
+    elif not chunks:
+        result = ""
+    else:
+        print(f"Transcribing {len(chunks)} audio chunks")
+        with ThreadPoolExecutor(max_workers=CLIENTS_PER_SPACE, thread_name_prefix="specter-whisper") as pool:
+            futures = [pool.submit(contextvars.copy_context().run, _transcribe_file, chunk) for chunk in chunks]
+            result = stitch_transcripts([future.result() for future in futures])
+    transcript_cache.set(key, result)
+    return result
+
+
+def _transcribe_file(audio_path: str) -> str:
+    key = transcript_cache_key(audio_path)
+    cached = transcript_cache.get(key)
+    if cached is not None:
+        return cached
+
+    record_bytes("whisper", "out", os.path.getsize(audio_path))
+    with span("upstream", "whisper"):
+        result = predict(
+            "whisper",
+            file(audio_path),
+            "transcribe",
+            api_name="/predict",
+        )
+    transcript_cache.set(key, result)
     return result
 
 
 def enrich_idea(idea: str) -> str:
     print("Enriching idea")
-    clientIdea = Client("LauzHack/Kimi-VL-A3B-Thinking", token=os.getenv("HF_TOKEN"))
     
     system_prompt = f"""
     You are a world class creative assistant that helps people to enrich their ideas. 
@@ -65,79 +166,416 @@ def enrich_idea(idea: str) -> str:
     """
 
     
-    enriched_idea = clientIdea.predict(
-        system_prompt=system_prompt,
-        api_name="/predict"
-    )
+    with span("upstream", "kimi"):
+        enriched_idea = predict(
+            "kimi",
+            system_prompt=system_prompt,
+            api_name="/predict"
+        )
     
     return enriched_idea[0][0][1].split("Summary")[1].strip()
 
 
 def create_folder(name: str) -> str:
-    os.makedirs(name, exist_ok=True)
+    os.makedirs(resolve_path(name), exist_ok=True)
     return f"Folder '{name}' created."
 
 def create_file(name: str) -> str:
-    with open(name, 'w') as f:
+    with open(resolve_path(name), 'w') as f:
         f.write("")  # create an empty file
     return f"File '{name}' created."
 
 
 def write_file(path: str, text: str) -> None:
-    with open(path, 'w') as file:
+    with open(resolve_path(path), 'w') as file:
         file.write(text)
         file.close()
-        
-        
-def save_to_txt(data: str, filename: str = "competition_output.txt"):
+    emit_event({"type": "file_written", "path": path, "content": text})
+
+
+def _manifest_entries(files: str) -> list[tuple[str, str | None]]:
+    """
+    Parse a write_files manifest: a JSON object {"path": "content", ...} or
+    a list of {"path": ..., "content": ...}. Paths ending with "/" (or with
+    null content) are folders. Every path must be relative and stay inside
+    the project.
+    """
+    data = json.loads(files)
+    if isinstance(data, dict):
+        entries = list(data.items())
+    elif isinstance(data, list):
+        entries = [(item["path"], item.get("content")) for item in data]
+    else:
+        raise ValueError("The manifest must be a JSON object or list.")
+
+    for path, content in entries:
+        if not isinstance(path, str) or not path.strip():
+            raise ValueError(f"Invalid path: {path!r}")
+        if os.path.isabs(path) or ".." in path.replace("\\", "/").split("/"):
+            raise ValueError(f"Path '{path}' must be relative and stay inside the project.")
+        if content is not None and not isinstance(content, str):
+            raise ValueError(f"Content of '{path}' must be a string.")
+    return entries
+
+
+def write_files(files: str) -> str:
+    """
+    Create many folders and files in one tool call. The manifest is
+    validated before anything is written; if writing then fails (a path
+    that is already a folder, ...), the result says what was written.
+    """
     try:
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        formatted_text = f"--- Competition Output ---\nTimestamp: {timestamp}\n\n{data}\n\n"
+        entries = [(path, resolve_path(path), content) for path, content in _manifest_entries(files)]
+    except (ValueError, KeyError, TypeError) as e:
+        return f"Error: invalid manifest, nothing was written ({e})"
+
+    folders = 0
+    written = []
+    for path, full_path, content in entries:
+        try:
+            if content is None or path.endswith("/"):
+                os.makedirs(full_path, exist_ok=True)
+                folders += 1
+                continue
+            os.makedirs(os.path.dirname(full_path) or ".", exist_ok=True)
+            with open(full_path, "w", encoding="utf-8") as f:
+                f.write(content)
+        except OSError as e:
+            return (
+                f"Error writing '{path}' ({e}). Created {folders} folders and wrote {len(written)} files "
+                f"before it: {', '.join(written)}. Nothing after it was written."
+            )
+        written.append(path)
+        emit_event({"type": "file_written", "path": path, "content": content})
 
-        with open(filename, "a", encoding="utf-8") as f:
-            f.write(formatted_text)
+    return f"Created {folders} folders and wrote {len(written)} files: {', '.join(written)}"
+
+
+def save_to_txt(data: str) -> str:
+    """
+    Tool used by the competition agent to save its final analysis. Each
+    call is stored as its own record for the current job.
+    """
+    try:
+        job_id = current_job_id.get() or "standalone"
+        record_id = save_competition_analysis(job_id, data)
+        return f"Data successfully saved (record {record_id})"
 
-        return f"Data successfully saved to {filename}"
-    
     except Exception as e:
         return f"Error saving data: {e}"
-    
+
 # Scrape raw text from a website
 def scrape_website(url: str) -> str:
+    if current_compactor.get() is not None:
+        return scrape_websites(url)
     try:
-        # Send GET request to the URL
-        response = requests.get(url)
-        response.raise_for_status()  # Raise error for bad HTTP codes
-
-        # Parse and clean up the raw HTML content
-        soup = BeautifulSoup(response.content, "html.parser")
-        text = soup.get_text(separator=" ", strip=True)
-        text = re.sub(r'\s+', ' ', text)  # Normalize whitespace
-
-        # Limit to 5000 characters for performance and API limits
-        return text[:5000]
+        # Streamed through the shared session, limited to MAX_PAGE_CHARS of text
+        return fetch_page_text(url)
     except Exception as e:
         return f"Error scraping website: {e}"
 
+# Scrape several websites at once, fetched concurrently
+def scrape_websites(urls: str) -> str:
+    url_list = [u.strip() for u in re.split(r"[\s,]+", urls) if u.strip()]
+    if not url_list:
+        return "Error scraping websites: no URL given"
+
+    compactor = current_compactor.get()
+    if compactor is None:
+        return "\n\n".join(f"--- {url} ---\n{text}" for url, text in scrape_many(url_list))
+    if compactor.exhausted:
+        return "Context budget reached: no more pages will be read. Write the analysis with the material gathered so far."
+
+    # Within a competition analysis, the agent only gets the passages of
+    # each page relevant to the project, within the analysis' budget
+    pages = scrape_many(url_list, SOURCE_PAGE_CHARS)
+    fetched = [(url, text) for url, text in pages if not text.startswith(SCRAPE_ERROR_PREFIX)]
+    compacted = dict(compactor.compact_pages(fetched))
+    raw = sum(len(text) for _, text in fetched)
+    kept = sum(len(text) for text in compacted.values())
+    record_bytes("compaction", "in", raw)
+    record_bytes("compaction", "out", kept)
+    print(f"Compacted {len(fetched)} pages from {raw} to {kept} chars ({compactor.remaining} left)")
+    return "\n\n".join(f"--- {url} ---\n{compacted.get(url, text)}" for url, text in pages)
+
 #takes a query and returns the URLs related to the query
 def search(query):
-    tavily_client = TavilyClient(api_key=os.getenv("TAVILY_API_KEY"))
-    response = tavily_client.search(query)
-    urls=[]
-    for i in range(len(response.get('results'))):
-        url = response.get('results')[i].get('url')
-        urls.append(url)
-    return urls
+    compactor = current_compactor.get()
+    if compactor is not None:
+        compactor.add_query(query)
+    # Cached per normalized query, see web.search_urls
+    return search_urls(query)
 
 
+def _token_usage(conversation) -> tuple[int, int] | None:
+    """
+    (input, output) LLM tokens used by a conversation, when WayFlow
+    reports them.
+    """
+    usage = getattr(conversation, "token_usage", None)
+    if usage is None:
+        return None
+    input_tokens = getattr(usage, "input_tokens", None)
+    output_tokens = getattr(usage, "output_tokens", None)
+    if input_tokens is None or output_tokens is None:
+        return None
+    return input_tokens, output_tokens
 
-def create_code(image_path: str | None, audio_url: str | None) -> str:
-    print("Creating spec from image:", image_path)
 
-    llm_config = OpenAiConfig(
-        name="openai-gpt-5",
-        model_id="gpt-5",
+def direct_call(tool_name: str, fn, *args) -> str:
+    """
+    Call a tool function without an agent, measured like a tool call.
+    """
+    return instrument_tool(tool_name, fn)(*args)
+
+
+# Labels extractor agents put before the tool output: "Extracted text:",
+# "**Transcription:**", "Here is the extracted handwritten text from the
+# image:", ...
+ANSWER_LABEL = re.compile(
+    r"^\W*(?:here is |here's )?(?:the )?(?:extracted |transcribed )?(?:handwritten |audio )?"
+    r"(?:text|transcription|transcript|content)(?: from the (?:image|audio|file|recording))?"
+    r"(?: is)?\s*:(?:\*\*|__)?\s*",
+    re.IGNORECASE,
+)
+
+
+def strip_answer_label(content: str) -> str:
+    """
+    Drop the label an extractor agent puts before the tool output. Only
+    known labels go: a colon in the text itself ("Project: ...") stays.
+    """
+    return ANSWER_LABEL.sub("", content.strip(), count=1).strip()
+
+
+def run_conversation(agent_name: str, agent, message: str) -> list:
+    """
+    Run one agent conversation to completion and return its messages.
+    Timing and token usage go to the metrics.
+    """
+    conversation = agent.start_conversation()
+    conversation.append_user_message(message)
+    with span("agent", agent_name):
+        conversation.execute()
+
+    usage = _token_usage(conversation)
+    if usage is not None:
+        record_tokens(agent_name, *usage)
+
+    messages = conversation.get_messages()
+    print(f"{agent_name}: finished with {len(messages)} messages")
+    return messages
+
+
+ENRICHER_PROMPT = (
+    "You will take in input a short idea related to entrepreneurship, startups, and business innovation, and enrich it into a detailed description."
+)
+
+
+CREATOR_PROMPT = """
+    You are given a natural-language specification of a software project.
+
+    Your task is to:
+
+    1. Create a single top-level directory named GeneratedProject.
+
+    2. Inside this directory, infer a complete project directory structure (you may use subfolders such as frontend, backend, services, utils, tests, etc.).
+
+    3. If the specification describes a web application (e.g., a site or web app with a browser-based UI):
+    - Scaffold a minimal but functional web application inside the top-level directory.
+    - Choose a reasonable tech stack based on the specification (for example: a React/Vite/Next.js/Vanilla JS frontend, and optionally a Node/Express or Python backend).
+    - Create all necessary configuration files to run the app (for example: `package.json`, build config, basic entrypoints like `src/main.jsx`, `public/index.html`, or similar).
+    - Ensure that after dependencies are installed, the app can be started with a standard command (such as `npm start`, `npm run dev`, or the equivalent for the chosen stack).
+
+    4. Propose concrete file names for each folder.
+
+    5. For every file, provide a short description of its purpose.
+
+    6. For every file, list the key functions it should contain, each defined by:
+    - "name": the function name
+    - "args": an array of argument names
+    - "description": a short explanation of what the function does
+
+    7. **Physically create** the entire directory structure and all files using your available tools.
+    Use write_files to create many files (with their full content) in a single call: pass a JSON object
+    mapping each file path to its content. Parent folders are created automatically, and you don't need
+    create_file before writing. Write the whole project in as few write_files calls as possible.
+
+    8. Inside each file:
+    - Implement the functions
+
+    9. After creation, return the final project structure as a single JSON object following the example format below.
+
+    Example format (do NOT reuse the example names, files, or functions):
+
+    MainProject
+    {
+    "frontend": {
+        "MainProject/frontend/index.html": "HTML structure for the homepage",
+        "MainProject/frontend/app.js": "Main JavaScript entry point",
+        "functions": [
+        {
+            "name": "renderHomepage",
+            "args": ["data"],
+            "description": "Renders the homepage using provided data."
+        }
+        ]
+    },
+    "backend": {
+        "MainProjectbackend/server.py": "Flask server handling routes",
+        "functions": [
+        {
+            "name": "start_server",
+            "args": ["host", "port"],
+            "description": "Launches the server on the given host and port."
+        }
+        ]
+    }
+    }
+
+    Requirements and constraints:
+    - All generated folders and files must be placed under a single top-level directory named after the application.
+    - Subfolders are allowed  (e.g., frontend/components, backend/services).
+    - Each folder value in the JSON output must be a JSON object.
+    - Inside each folder:
+    - Files must be represented as:
+            "path/to/fileName.ext": "Short description"
+    - A "functions" key may describe the functions contained in those files.
+    - The agent must **actually create** all directories and files described.
+    - If the project is a web application, the agent must also create a runnable web app scaffold (including any required configuration/entry files).
+    - Output valid JSON with double quotes and no trailing commas
+    -Be sure that the code is of quality, remember created function to reuse them later.
+"""
+
+
+COMPETITION_PROMPT = """
+    {% raw %}
+    You are the Competition Analysis Agent. You receive long specification documents or descriptions of a project from the user. Your mission is:
+
+    1. Read the entire specification and extract the core idea of the project. Summarize it in simple terms that capture the product, the problem it solves, its main features, and the value it provides.
+
+    2. Based on the extracted idea, generate three to six strong competitor search queries. These queries should capture the essence of the product, its function, and its market category. They must be expressed as natural language search queries that could realistically be typed by someone researching competitors.
+
+    3. Automatically call the search tool using the best query. If needed, additional queries may also be used. Then optionally call the scrape_websites tool with several relevant URLs returned by search at once (or scrape_website for a single URL).
+
+    4. Use both gathered data and reasoning when tool output is incomplete. Even if tool calls fail, you must still produce a complete analysis.
+
+    5. Create a full competitive analysis in the required format described below.
+
+    --------------------------------------------------------------------------------------------------
+    OUTPUT FORMAT RULES — THE FINAL RESULT MUST BE ONE SINGLE CLEAN PLAIN TEXT STRING
+    --------------------------------------------------------------------------------------------------
+    Your final analysis must be returned as a single plain text string with no formatting syntax of any kind. No markdown. No bullet points. No hyphens. No stars. No tables. No code blocks. No JSON. No YAML. No numbering that uses symbols. No headings with symbols such as # or ##.
+
+    Structure the plain text in the following order:
+
+    A. Extracted Idea: a paragraph describing the project idea you extracted from the specification.
+
+    B. Search Queries Generated: a single paragraph listing all search queries separated by commas.
+
+    C. Competitor Summaries: for each competitor, write one short paragraph describing the competitor, what they do, the features they offer, their strengths, and their weaknesses. Competitor paragraphs must be separated by a blank line. Do not use bullet points, lists, or tables. Only flowing natural language paragraphs.
+
+    D. Market Observations: one or two paragraphs explaining relevant trends, insights, or gaps in the market.
+
+    E. SWOT Analysis: four paragraphs labeled Strengths:, Weaknesses:, Opportunities:, Threats:. Each paragraph must be continuous text with no lists and no bullet points.
+
+    F. Recommendations: one or two paragraphs with strategic guidance, again without lists or special formatting.
+
+    The entire output must be one single multiline plain text string. It must be safe to pass directly to a frontend or to a storage system without further cleanup.
+
+    --------------------------------------------------------------------------------------------------
+    MANDATORY SAVE BEHAVIOR
+    --------------------------------------------------------------------------------------------------
+    After generating this entire plain text analysis:
+
+    1. You MUST call the save_to_txt tool with the final string as the value of data.
+    2. After the tool call returns, you MUST send a final human-facing message saying: The analysis is complete and has been saved.
+    3. After sending this final message, you MUST stop and produce no additional tool calls or output.
+
+    --------------------------------------------------------------------------------------------------
+    TOOL USAGE LOGIC
+    --------------------------------------------------------------------------------------------------
+    1. Always begin by extracting the idea from the user's document.
+    2. Then generate search queries.
+    3. Then call the search tool with the best query.
+    4. Optionally use scrape_websites on relevant URLs, passing them together in one call.
+    5. Continue analysis even if search or scraping fails.
+    6. Never tell the user you cannot perform the analysis.
+    7. Never ask the user whether they want the analysis to be saved. Saving is automatic.
+
+    --------------------------------------------------------------------------------------------------
+    BEHAVIORAL RULES
+    --------------------------------------------------------------------------------------------------
+    Do not use markdown. Do not use tables. Do not use lists. Do not generate JSON. Do not format text using symbols. Do not break the plain text requirement. Always stay analytical and descriptive. Always finish with a save_to_txt tool call followed by one short confirmation message, then stop.
+
+    {% endraw %}
+    """
+
+
+# "direct": the OCR and transcription stages call their tool functions
+# directly, since there is nothing to reason about; "agent": each goes
+# through its LLM agent (two extra LLM round-trips per job)
+EXTRACTOR_MODE = os.getenv("SPECTER_EXTRACTOR_MODE", "direct")
+# Boards of one job OCR'd at the same time
+OCR_PARALLELISM = int(os.getenv("SPECTER_OCR_PARALLELISM", str(CLIENTS_PER_SPACE)))
+
+# LLM behind every agent. Set SPECTER_LLM_URL to use an OpenAI-compatible
+# server instead of the OpenAI API
+LLM_URL = os.getenv("SPECTER_LLM_URL")
+LLM_MODEL = os.getenv("SPECTER_LLM_MODEL", "gpt-5")
+
+# Loaded WayFlow agents, built once per process by get_agents()
+_agents: dict | None = None
+_agents_lock = threading.Lock()
+
+
+def rate_limit_llm(llm) -> None:
+    """
+    Send each chat completion of a WayFlow model through the "llm"
+    upstream: every request takes a rate-limit token and a concurrency
+    slot, with a timeout and retries, while the tool calls between them
+    hold neither. Streamed completions are read whole inside the call.
+    """
+    if getattr(llm, "_specter_rate_limited", False):
+        return
+    generate = getattr(llm, "_generate_impl", None)
+    stream_generate = getattr(llm, "_stream_generate_impl", None)
+    if generate is None or stream_generate is None:
+        print(f"Cannot rate limit {type(llm).__name__}: its requests are not limited")
+        return
+
+    async def limited_generate(*args, **kwargs):
+        return await acall_upstream("llm", lambda timeout: generate(*args, **kwargs))
+
+    async def limited_stream_generate(*args, **kwargs):
+        async def collect():
+            return [chunk async for chunk in stream_generate(*args, **kwargs)]
+
+        for chunk in await acall_upstream("llm", lambda timeout: collect()):
+            yield chunk
+
+    llm._generate_impl = limited_generate
+    llm._stream_generate_impl = limited_stream_generate
+    llm._specter_rate_limited = True
+
+
+def _build_agents() -> dict:
+    """
+    Build the Agent Spec definitions and load them into WayFlow agents.
+    This is the expensive part of a run that does not depend on the inputs.
+    """
+    if LLM_URL:
+        # Any OpenAI-compatible server, e.g. the local stand-in of bench.py
+        llm_config = OpenAiCompatibleConfig(
+            name="openai-compatible",
+            model_id=LLM_MODEL,
+            url=LLM_URL,
         )
+    else:
+        llm_config = OpenAiConfig(
+            name="openai-gpt-5",
+            model_id=LLM_MODEL,
+            )
         
     
     extract_handwriting_tool = ServerTool(
@@ -175,6 +613,15 @@ def create_code(image_path: str | None, audio_url: str | None) -> str:
         description="Write header functions to a file given the project specification.",
         inputs=[StringProperty(title="path"), StringProperty(title="text")],
     )
+
+    write_files_tool = ServerTool(
+        name="write_files",
+        description=(
+            "Create many files at once. Takes a JSON object mapping each file path to its full content "
+            "(a path ending with '/' creates an empty folder). Parent folders are created automatically."
+        ),
+        inputs=[StringProperty(title="files")],
+    )
     
     search_tool = ServerTool(
         name="search",
@@ -188,9 +635,15 @@ def create_code(image_path: str | None, audio_url: str | None) -> str:
         inputs=[StringProperty(title="url")],
     )
 
+    scrape_websites_tool = ServerTool(
+        name="scrape_websites",
+        description="Scrape several websites at once. Takes URLs separated by commas or newlines and returns the text of each page relevant to the project",
+        inputs=[StringProperty(title="urls")],
+    )
+
     save_to_txt_tool = ServerTool(
         name="save_to_txt",
-        description=" Scrape raw text from a website and returns the text",
+        description="Save the final competition analysis text.",
         inputs=[StringProperty(title="data")],
     )
 
@@ -201,10 +654,13 @@ def create_code(image_path: str | None, audio_url: str | None) -> str:
         "create_file": create_file,
         "create_folder": create_folder,
         "write_file": write_file,
+        "write_files": write_files,
         "search": search,
         "scrape_website": scrape_website,
+        "scrape_websites": scrape_websites,
         "save_to_txt": save_to_txt,
     }
+    tool_registry = {name: instrument_tool(name, fn) for name, fn in tool_registry.items()}
     
     agentExtractor = Agent(
         name="Text Extractor Agent",
@@ -228,163 +684,23 @@ def create_code(image_path: str | None, audio_url: str | None) -> str:
         name="Idea Enricher Agent",
         llm_config=llm_config,
         tools=[enrich_idea_tool],
-        system_prompt=(
-            "You will take in input a short idea related to entrepreneurship, startups, and business innovation, and enrich it into a detailed description."
-        ),
+        system_prompt=ENRICHER_PROMPT,
     )
-    
-    
-    
-    CreatorPrompt = """
-        You are given a natural-language specification of a software project.
-
-        Your task is to:
-
-        1. Create a single top-level directory named GeneratedProject.
-
-        2. Inside this directory, infer a complete project directory structure (you may use subfolders such as frontend, backend, services, utils, tests, etc.).
-
-        3. If the specification describes a web application (e.g., a site or web app with a browser-based UI):
-        - Scaffold a minimal but functional web application inside the top-level directory.
-        - Choose a reasonable tech stack based on the specification (for example: a React/Vite/Next.js/Vanilla JS frontend, and optionally a Node/Express or Python backend).
-        - Create all necessary configuration files to run the app (for example: `package.json`, build config, basic entrypoints like `src/main.jsx`, `public/index.html`, or similar).
-        - Ensure that after dependencies are installed, the app can be started with a standard command (such as `npm start`, `npm run dev`, or the equivalent for the chosen stack).
-
-        4. Propose concrete file names for each folder.
-
-        5. For every file, provide a short description of its purpose.
-
-        6. For every file, list the key functions it should contain, each defined by:
-        - "name": the function name
-        - "args": an array of argument names
-        - "description": a short explanation of what the function does
-
-        7. **Physically create** the entire directory structure and all files using your available tools.
-
-        8. Inside each file:
-        - Implement the functions
-
-        9. After creation, return the final project structure as a single JSON object following the example format below.
-
-        Example format (do NOT reuse the example names, files, or functions):
-
-        MainProject
-        {
-        "frontend": {
-            "MainProject/frontend/index.html": "HTML structure for the homepage",
-            "MainProject/frontend/app.js": "Main JavaScript entry point",
-            "functions": [
-            {
-                "name": "renderHomepage",
-                "args": ["data"],
-                "description": "Renders the homepage using provided data."
-            }
-            ]
-        },
-        "backend": {
-            "MainProjectbackend/server.py": "Flask server handling routes",
-            "functions": [
-            {
-                "name": "start_server",
-                "args": ["host", "port"],
-                "description": "Launches the server on the given host and port."
-            }
-            ]
-        }
-        }
-
-        Requirements and constraints:
-        - All generated folders and files must be placed under a single top-level directory named after the application.
-        - Subfolders are allowed  (e.g., frontend/components, backend/services).
-        - Each folder value in the JSON output must be a JSON object.
-        - Inside each folder:
-        - Files must be represented as:
-                "path/to/fileName.ext": "Short description"
-        - A "functions" key may describe the functions contained in those files.
-        - The agent must **actually create** all directories and files described.
-        - If the project is a web application, the agent must also create a runnable web app scaffold (including any required configuration/entry files).
-        - Output valid JSON with double quotes and no trailing commas
-        -Be sure that the code is of quality, remember created function to reuse them later.
-    """
-    
-    
-    CompetitionPrompt = """
-        {% raw %}
-        You are the Competition Analysis Agent. You receive long specification documents or descriptions of a project from the user. Your mission is:
-
-        1. Read the entire specification and extract the core idea of the project. Summarize it in simple terms that capture the product, the problem it solves, its main features, and the value it provides.
-
-        2. Based on the extracted idea, generate three to six strong competitor search queries. These queries should capture the essence of the product, its function, and its market category. They must be expressed as natural language search queries that could realistically be typed by someone researching competitors.
-
-        3. Automatically call the search tool using the best query. If needed, additional queries may also be used. Then optionally call the scrape_website tool on relevant URLs returned by search.
-
-        4. Use both gathered data and reasoning when tool output is incomplete. Even if tool calls fail, you must still produce a complete analysis.
-
-        5. Create a full competitive analysis in the required format described below.
-
-        --------------------------------------------------------------------------------------------------
-        OUTPUT FORMAT RULES — THE FINAL RESULT MUST BE ONE SINGLE CLEAN PLAIN TEXT STRING
-        --------------------------------------------------------------------------------------------------
-        Your final analysis must be returned as a single plain text string with no formatting syntax of any kind. No markdown. No bullet points. No hyphens. No stars. No tables. No code blocks. No JSON. No YAML. No numbering that uses symbols. No headings with symbols such as # or ##.
-
-        Structure the plain text in the following order:
-
-        A. Extracted Idea: a paragraph describing the project idea you extracted from the specification.
-
-        B. Search Queries Generated: a single paragraph listing all search queries separated by commas.
-
-        C. Competitor Summaries: for each competitor, write one short paragraph describing the competitor, what they do, the features they offer, their strengths, and their weaknesses. Competitor paragraphs must be separated by a blank line. Do not use bullet points, lists, or tables. Only flowing natural language paragraphs.
-
-        D. Market Observations: one or two paragraphs explaining relevant trends, insights, or gaps in the market.
-
-        E. SWOT Analysis: four paragraphs labeled Strengths:, Weaknesses:, Opportunities:, Threats:. Each paragraph must be continuous text with no lists and no bullet points.
-
-        F. Recommendations: one or two paragraphs with strategic guidance, again without lists or special formatting.
 
-        The entire output must be one single multiline plain text string. It must be safe to pass directly to a frontend or to a storage system without further cleanup.
 
-        --------------------------------------------------------------------------------------------------
-        MANDATORY SAVE BEHAVIOR
-        --------------------------------------------------------------------------------------------------
-        After generating this entire plain text analysis:
-
-        1. You MUST call the save_to_txt tool with the final string as the value of data.
-        2. After the tool call returns, you MUST send a final human-facing message saying: The analysis is complete and has been saved.
-        3. After sending this final message, you MUST stop and produce no additional tool calls or output.
-
-        --------------------------------------------------------------------------------------------------
-        TOOL USAGE LOGIC
-        --------------------------------------------------------------------------------------------------
-        1. Always begin by extracting the idea from the user's document.
-        2. Then generate search queries.
-        3. Then call the search tool with the best query.
-        4. Optionally use scrape_website on relevant URLs.
-        5. Continue analysis even if search or scraping fails.
-        6. Never tell the user you cannot perform the analysis.
-        7. Never ask the user whether they want the analysis to be saved. Saving is automatic.
-
-        --------------------------------------------------------------------------------------------------
-        BEHAVIORAL RULES
-        --------------------------------------------------------------------------------------------------
-        Do not use markdown. Do not use tables. Do not use lists. Do not generate JSON. Do not format text using symbols. Do not break the plain text requirement. Always stay analytical and descriptive. Always finish with a save_to_txt tool call followed by one short confirmation message, then stop.
-
-        {% endraw %}
-        """
-
-    
     agentCreator = Agent(
         name="Structure Creation Agent",
         llm_config=llm_config,
-        tools=[create_folder_tool, create_file_tool, write_file_tool], 
-        system_prompt=(CreatorPrompt),
+        tools=[create_folder_tool, create_file_tool, write_file_tool, write_files_tool], 
+        system_prompt=(CREATOR_PROMPT),
     )
 
 
     agentCompetition = Agent(
         name="Competition Analysis Agent",
         llm_config=llm_config,
-        tools=[search_tool, scrape_website_tool, save_to_txt_tool], 
-        system_prompt=(CompetitionPrompt),
+        tools=[search_tool, scrape_website_tool, scrape_websites_tool, save_to_txt_tool], 
+        system_prompt=(COMPETITION_PROMPT),
     )
     
     
@@ -401,92 +717,334 @@ def create_code(image_path: str | None, audio_url: str | None) -> str:
     wayflow_agentEnricher = loader.load_json(serialized_agentEnricher)
     wayflow_agentCreator = loader.load_json(serialized_agentCreator)
     wayflow_agentCompetition = loader.load_json(serialized_agentCompetition)
-    
-    conversationExtractor = wayflow_agentExtractor.start_conversation()
-    conversationExtractor.append_user_message(f"Extract handwritten text from the following image URL: {image_path}")
-    conversationExtractor.execute()
-    messages = conversationExtractor.get_messages()
-        
-    clean_messages = messages[-1].contents[0].content.split(":")[1].strip()
-    print("Extracted Handwritten Text:\n", clean_messages)
-
-    if audio_url:
-        conversationAudioExtractor = wayflow_agentAudioExtractor.start_conversation()
-        conversationAudioExtractor.append_user_message(f"Extract audio text from the following audio file: {audio_url}")
-        conversationAudioExtractor.execute()
-        messages = conversationAudioExtractor.get_messages()
-        
-        audio_text = messages[-1].contents[0].content.split(":")[1].strip()
-        print("Extracted Audio Text:\n", audio_text)
-    else:
-        audio_text = ""
+    for wayflow_agent in (
+        wayflow_agentExtractor, wayflow_agentAudioExtractor, wayflow_agentEnricher,
+        wayflow_agentCreator, wayflow_agentCompetition,
+    ):
+        rate_limit_llm(wayflow_agent.llm)
+
+    return {
+        "extractor": wayflow_agentExtractor,
+        "audio_extractor": wayflow_agentAudioExtractor,
+        "enricher": wayflow_agentEnricher,
+        "creator": wayflow_agentCreator,
+        "competition": wayflow_agentCompetition,
+    }
 
-    conversationEnricher = wayflow_agentEnricher.start_conversation()
-    conversationEnricher.append_user_message(f"Enrich the following idea into a detailed description: {clean_messages}, {audio_text}")
-    conversationEnricher.execute()
-    messages = conversationEnricher.get_messages()
-        
-    
-    spec = messages[-1].contents[0].content
-    print("Enriched Idea:\n", spec)
-    
-    conversationCompetition = wayflow_agentCompetition.start_conversation()
-    conversationCompetition.append_user_message(spec)
-    conversationCompetition.execute()
-    messages = conversationCompetition.get_messages()
-    
-    competition_output = ""
 
-    if os.path.exists("competition_output.txt"):
-        with open("competition_output.txt", "r", encoding="utf-8") as f:
-            competition_output = f.read()
+def get_agents() -> dict:
+    """
+    Return the loaded WayFlow agents, building them on first use.
+    Every caller starts its own conversations from these shared agents.
+    """
+    global _agents
+    if _agents is None:
+        with _agents_lock:
+            if _agents is None:
+                _agents = _build_agents()
+    return _agents
+
+
+def create_code(
+    image_path: str | list[str] | None,
+    audio_url: str | None,
+    workspace: str | None = None,
+    project_id: str | None = None,
+    use_llm_cache: bool = True,
+) -> str:
+    """
+    image_path: one whiteboard photo, or several (OCR'd concurrently and
+    merged in order).
+    workspace: job scratch directory. The file tools resolve the paths the
+    agents use against it, so concurrent jobs never share files.
+    project_id: when given, the generated project is saved under this id and
+    a later run with the same id only regenerates files whose part of the
+    structure changed.
+    use_llm_cache: False to ignore cached enricher / creator outputs (when
+    SPECTER_LLM_CACHE is on); the fresh outputs still replace them.
+    """
+    print("Creating spec from image:", image_path)
+    if isinstance(image_path, str):
+        image_paths = [image_path]
     else:
-        competition_output = "No competition analysis found."
-    
-    print("Competition Analysis Output:\n", competition_output)
-    
-    conversationCreator = wayflow_agentCreator.start_conversation()
-    conversationCreator.append_user_message(spec)
-    conversationCreator.execute()
-    messages = conversationCreator.get_messages()
-    
-    print(messages)
+        image_paths = list(image_path or [])
+    if workspace is not None:
+        current_workspace.set(workspace)
+    # Results stored by the tools are keyed by job; standalone runs get their own id
+    job_id = current_job_id.get()
+    if job_id is None:
+        job_id = new_job_id()
+        current_job_id.set(job_id)
+
+    agents = get_agents()
+    wayflow_agentExtractor = agents["extractor"]
+    wayflow_agentAudioExtractor = agents["audio_extractor"]
+    wayflow_agentEnricher = agents["enricher"]
+    wayflow_agentCreator = agents["creator"]
+    wayflow_agentCompetition = agents["competition"]
     
-    structure_json_str = messages[-1].contents[0].content
-    for msg in messages:
-        print(msg.contents)
-    
-    try:
-        data = json.loads(structure_json_str)
-        project_root = None
+    # Whether each stage was served from cache, reported with the result
+    cache_hits = {
+        "ocr": False,
+        "transcript": bool(audio_url) and transcript_cache_key(audio_url) in transcript_cache,
+        "enrich": False,
+        "creator": False,
+    }
+    read_llm_cache = LLM_CACHE_ENABLED and use_llm_cache
+
+    def preprocess_image_stage(inputs: dict) -> list[str]:
+        # Smaller grayscale crops of the boards, next to the original uploads
+        output_paths = [f"{os.path.splitext(path)[0]}.ocr.jpg" for path in image_paths]
+        return preprocess_images(image_paths, output_paths)
+
+    def ocr_one(ocr_image_path: str) -> str:
+        if EXTRACTOR_MODE == "direct":
+            return direct_call("extract_handwriting", extract_handwriting, ocr_image_path).strip()
+        messages = run_conversation(
+            "extractor", wayflow_agentExtractor,
+            f"Extract handwritten text from the following image URL: {ocr_image_path}",
+        )
+        return strip_answer_label(messages[-1].contents[0].content)
+
+    def extract_text_stage(inputs: dict) -> str:
+        if not image_paths:
+            return ""
+        # Fall back to the raw uploads if preprocessing crashed
+        ocr_image_paths = inputs["preprocess_image"] or image_paths
+        cache_hits["ocr"] = all(ocr_cache_key(path) in ocr_cache for path in ocr_image_paths)
+
+        if len(ocr_image_paths) == 1:
+            texts = [ocr_one(ocr_image_paths[0])]
+        else:
+            # Boards are independent: OCR them together, at most
+            # OCR_PARALLELISM at a time (and CLIENTS_PER_SPACE per Space)
+            with ThreadPoolExecutor(max_workers=OCR_PARALLELISM, thread_name_prefix="specter-ocr") as pool:
+                futures = [pool.submit(contextvars.copy_context().run, ocr_one, path) for path in ocr_image_paths]
+                texts = [future.result() for future in futures]
+
+        clean_messages = merge_ocr_texts(texts)
+        print("Extracted Handwritten Text:\n", clean_messages)
+        return clean_messages
+
+    def extract_audio_stage(inputs: dict) -> str:
+        if not audio_url:
+            return ""
+        if EXTRACTOR_MODE == "direct":
+            audio_text = direct_call("extract_audio", extract_audio, audio_url).strip()
+        else:
+            messages = run_conversation(
+                "audio_extractor", wayflow_agentAudioExtractor,
+                f"Extract audio text from the following audio file: {audio_url}",
+            )
+            audio_text = strip_answer_label(messages[-1].contents[0].content)
+        print("Extracted Audio Text:\n", audio_text)
+        return audio_text
+
+    def enrich_stage(inputs: dict) -> str:
+        # A failed extractor shows up as None: enrich whatever we still have
+        clean_messages = inputs["extract_text"] or ""
+        audio_text = inputs["extract_audio"] or ""
+        if not clean_messages and not audio_text:
+            raise RuntimeError("No text could be extracted from the inputs.")
+
+        key = enrich_cache_key(clean_messages, audio_text)
+        spec = enrich_cache.get(key) if read_llm_cache else None
+        if spec is not None:
+            print("Enriched idea cache hit")
+            cache_hits["enrich"] = True
+            return spec
+
+        messages = run_conversation(
+            "enricher", wayflow_agentEnricher,
+            f"Enrich the following idea into a detailed description: {clean_messages}, {audio_text}",
+        )
 
-        for folder_content in data.values():
-            if not isinstance(folder_content, dict):
-                continue
-            for path, desc in folder_content.items():
-                if path == "functions" or not isinstance(desc, str):
+        spec = messages[-1].contents[0].content
+        print("Enriched Idea:\n", spec)
+        if LLM_CACHE_ENABLED:
+            enrich_cache.set(key, spec)
+        return spec
+
+    def competition_stage(inputs: dict) -> str:
+        spec = inputs["enrich"]
+        if spec is None:
+            raise RuntimeError("No specification available.")
+        # Optional: while search is down, skip it rather than hold the job
+        # until its calls fail
+        if not is_available("tavily"):
+            print("Skipping competition analysis: search is unavailable")
+            return "Competition analysis skipped: web search is temporarily unavailable."
+
+        # Scrape tools compact pages against the spec, within one budget
+        token = current_compactor.set(ContextCompactor(spec))
+        try:
+            run_conversation("competition", wayflow_agentCompetition, spec)
+        finally:
+            current_compactor.reset(token)
+
+        # Only this job's analysis, as saved by the save_to_txt tool
+        competition_output = latest_competition_analysis(job_id)
+        if competition_output is None:
+            competition_output = "No competition analysis found."
+
+        print("Competition Analysis Output:\n", competition_output)
+        return competition_output
+
+    # Filled by the creator stage when it reuses a previous generation
+    regeneration = {}
+
+    def run_creator(message: str) -> str:
+        messages = run_conversation("creator", wayflow_agentCreator, message)
+        return messages[-1].contents[0].content
+
+    def regenerate_incrementally(spec: str, previous: dict) -> str:
+        # 1. Plan the new structure without writing anything
+        planned_json_str = run_creator(
+            f"{spec}\n\n"
+            "PLANNING ONLY: do not call any tool. Return only the project structure JSON for this "
+            "specification. This project was generated before with the structure below; keep the same "
+            "paths, descriptions and functions wherever the specification did not change them.\n"
+            f"{previous['structure_json']}"
+        )
+        try:
+            planned = json.loads(planned_json_str)
+        except ValueError:
+            print("Could not parse planned structure, regenerating the whole project")
+            return run_creator(spec)
+
+        # 2. Start from the saved project, minus the files that changed or
+        # are gone: everything else is reused, listed in the structure or not
+        changed, unchanged, removed = diff_fingerprints(previous["fingerprints"], file_fingerprints(planned))
+        missing = restore_files(project_id, resolve_path("."), keep=unchanged, drop=changed + removed)
+        changed += missing
+        regeneration.update({
+            "regenerated": changed,
+            "reused": [path for path in unchanged if path not in missing],
+            "removed": removed,
+        })
+        print(f"Incremental regeneration: {len(changed)} to generate, {len(unchanged) - len(missing)} reused")
+
+        if not changed:
+            return planned_json_str
+
+        # 3. Only ask for the files that are new or changed
+        run_creator(
+            f"{spec}\n\n"
+            "The project already exists with this structure:\n"
+            f"{planned_json_str}\n\n"
+            "All other files are already written and must not be touched. Create or rewrite ONLY these files:\n"
+            + "\n".join(changed)
+        )
+        return planned_json_str
+
+    def creator_stage(inputs: dict) -> tuple[str, dict | None, str]:
+        spec = inputs["enrich"]
+        if spec is None:
+            raise RuntimeError("No specification available.")
+
+        key = creator_cache_key(spec)
+        cached = creator_cache.get(key) if read_llm_cache else None
+        previous = load_project(project_id) if project_id else None
+        if cached is not None:
+            # Same spec as an earlier run: re-create its files, no LLM call
+            print("Creator cache hit")
+            cache_hits["creator"] = True
+            for path in write_project_files(cached["files"], resolve_path(".")):
+                emit_event({"type": "file_written", "path": path, "content": cached["files"][path]})
+            structure_json_str = cached["structure_json"]
+        elif previous is None:
+            structure_json_str = run_creator(spec)
+        else:
+            structure_json_str = regenerate_incrementally(spec, previous)
+
+        data = None
+        try:
+            data = json.loads(structure_json_str)
+            project_root = None
+
+            for folder_content in data.values():
+                if not isinstance(folder_content, dict):
                     continue
-                # e.g. "MyApp/frontend/index.html" -> "MyApp"
-                first_segment = path.split("/")[0]
-                if first_segment:
-                    project_root = first_segment
+                for path, desc in folder_content.items():
+                    if path == "functions" or not isinstance(desc, str):
+                        continue
+                    # e.g. "MyApp/frontend/index.html" -> "MyApp"
+                    first_segment = path.split("/")[0]
+                    if first_segment:
+                        project_root = first_segment
+                        break
+                if project_root:
                     break
-            if project_root:
-                break
 
-        if project_root is None:
-            # Fallback if JSON didn’t contain paths as expected
+            if project_root is None:
+                # Fallback if JSON didn’t contain paths as expected
+                project_root = "GeneratedProject"
+                os.makedirs(resolve_path(project_root), exist_ok=True)
+
+        except Exception as e:
+            print("Error parsing structure JSON to infer project root:", e)
+            structure_json_str = ""
+            data = None
             project_root = "GeneratedProject"
-            os.makedirs(project_root, exist_ok=True)
+            os.makedirs(resolve_path(project_root), exist_ok=True)
+
+        if LLM_CACHE_ENABLED and structure_json_str and cached is None:
+            files = read_project_files(resolve_path("."), project_root, MAX_CACHED_PROJECT_BYTES)
+            if files is not None:
+                creator_cache.set(key, {"structure_json": structure_json_str, "files": files})
+
+        if project_id and structure_json_str:
+            try:
+                save_project(project_id, structure_json_str, resolve_path("."), project_root, structure=data)
+            except Exception as e:
+                print("Could not save project state:", e)
+
+        # The parsed structure is passed on so nothing downstream re-parses it
+        return structure_json_str, data, project_root
+
+    # OCR and transcription are independent, and so are the competition
+    # analysis and the project creator once the spec exists.
+    results, errors, timings = run_stages({
+        "preprocess_image": ([], preprocess_image_stage),
+        "extract_text": (["preprocess_image"], extract_text_stage),
+        "extract_audio": ([], extract_audio_stage),
+        "enrich": (["extract_text", "extract_audio"], enrich_stage),
+        "competition": (["enrich"], competition_stage),
+        "creator": (["enrich"], creator_stage),
+    }, on_event=emit_event)
+    print("Stage timings (s):", timings)
+    for name, seconds in timings.items():
+        record_span("stage", name, seconds, errors.get(name))
+    run_info = {
+        "stage_timings": timings,
+        "stage_errors": errors,
+        "cache_hits": cache_hits,
+        "extractor_mode": EXTRACTOR_MODE,
+        "project_id": project_id,
+        "regeneration": regeneration or None,
+        "metrics": pop_job_metrics(job_id),
+    }
 
-    except Exception as e:
-        print("Error parsing structure JSON to infer project root:", e)
+    if "enrich" in errors:
+        raise RuntimeError(f"Could not build a specification: {errors['enrich']}")
+    spec = results["enrich"]
+
+    if "competition" in errors:
+        competition_output = f"Competition analysis failed: {errors['competition']}"
+    else:
+        competition_output = results["competition"]
+
+    if "creator" in errors:
         structure_json_str = ""
+        structure = None
         project_root = "GeneratedProject"
-        os.makedirs(project_root, exist_ok=True)
+    else:
+        structure_json_str, structure, project_root = results["creator"]
 
     # Return:
     # - spec (enriched idea / description)
     # - structure_json_str (JSON string with folders/files/functions)
+    # - structure (the same, parsed; None if it isn't valid JSON)
     # - project_root (top-level directory where code was created)
-    return spec, structure_json_str, project_root, competition_output
\ No newline at end of file
+    # - run_info (stage timings / errors and cache hits for this run)
+    return spec, structure_json_str, structure, project_root, competition_output, run_info
\ No newline at end of file
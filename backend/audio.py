@@ -0,0 +1,175 @@
+import os
+import shutil
+import subprocess
+import wave
+
+try:
+    import numpy as np
+except ImportError:  # no local audio stage, recordings are sent whole
+    np = None
+
+# Whisper works on 16 kHz mono
+SAMPLE_RATE = 16000
+FRAME_SECONDS = 0.03
+# Target chunk length, and how far back from it we look for a pause to cut at
+CHUNK_SECONDS = float(os.getenv("SPECTER_AUDIO_CHUNK_SECONDS", "30"))
+CUT_SEARCH_SECONDS = 5.0
+# Consecutive chunks share this much audio so no word is lost at a cut
+OVERLAP_SECONDS = 1.0
+# Each chunk must move past the previous cut's overlap
+if CHUNK_SECONDS <= CUT_SEARCH_SECONDS + OVERLAP_SECONDS:
+    raise ValueError(
+        f"SPECTER_AUDIO_CHUNK_SECONDS must be more than {CUT_SEARCH_SECONDS + OVERLAP_SECONDS:g} seconds"
+    )
+# Silence kept around speech when trimming
+PADDING_SECONDS = 0.2
+# Frames quieter than this (RMS, full scale = 1) are always silence
+MIN_SPEECH_RMS = 0.01
+
+
+def _decode_with_ffmpeg(path: str):
+    result = subprocess.run(
+        ["ffmpeg", "-nostdin", "-loglevel", "error", "-i", path,
+         "-ac", "1", "-ar", str(SAMPLE_RATE), "-f", "s16le", "-"],
+        capture_output=True,
+        check=True,
+    )
+    return np.frombuffer(result.stdout, dtype=np.int16).astype(np.float32) / 32768.0
+
+
+def _decode_wav(path: str):
+    with wave.open(path, "rb") as wav:
+        channels = wav.getnchannels()
+        width = wav.getsampwidth()
+        rate = wav.getframerate()
+        raw = wav.readframes(wav.getnframes())
+
+    if width == 1:
+        samples = (np.frombuffer(raw, dtype=np.uint8).astype(np.float32) - 128) / 128.0
+    elif width == 2:
+        samples = np.frombuffer(raw, dtype=np.int16).astype(np.float32) / 32768.0
+    elif width == 4:
+        samples = np.frombuffer(raw, dtype=np.int32).astype(np.float32) / 2147483648.0
+    else:
+        raise ValueError(f"Unsupported WAV sample width: {width}")
+
+    # Downmix, then resample by linear interpolation
+    samples = samples.reshape(-1, channels).mean(axis=1)
+    if rate != SAMPLE_RATE and len(samples):
+        duration = len(samples) / rate
+        target_times = np.arange(int(duration * SAMPLE_RATE)) / SAMPLE_RATE
+        samples = np.interp(target_times, np.arange(len(samples)) / rate, samples).astype(np.float32)
+    return samples
+
+
+def load_audio(path: str):
+    """
+    Decode a recording to 16 kHz mono float samples. Uses ffmpeg when it
+    is installed (any format the browser records), else reads plain WAV.
+    Returns None if the file can't be decoded locally.
+    """
+    if np is None:
+        return None
+    try:
+        if shutil.which("ffmpeg"):
+            return _decode_with_ffmpeg(path)
+        return _decode_wav(path)
+    except (OSError, EOFError, ValueError, wave.Error, subprocess.CalledProcessError) as e:
+        print("Could not decode audio locally:", e)
+        return None
+
+
+def _frame_energy(samples):
+    frame = int(FRAME_SECONDS * SAMPLE_RATE)
+    count = len(samples) // frame
+    frames = samples[: count * frame].reshape(count, frame)
+    return np.sqrt((frames ** 2).mean(axis=1))
+
+
+def _speech_frames(energy):
+    """
+    Energy-based voice activity: a frame is speech when it is well above
+    the recording's noise floor.
+    """
+    noise_floor = np.percentile(energy, 10) if len(energy) else 0.0
+    return energy > max(MIN_SPEECH_RMS, noise_floor * 3)
+
+
+def split_speech(samples) -> list[tuple[int, int]]:
+    """
+    Trim leading/trailing silence and split the rest into overlapping
+    (start, end) sample ranges of about CHUNK_SECONDS, cutting at the
+    quietest frame near each chunk boundary.
+    """
+    frame = int(FRAME_SECONDS * SAMPLE_RATE)
+    energy = _frame_energy(samples)
+    speech = np.flatnonzero(_speech_frames(energy))
+    if not len(speech):
+        return []
+
+    padding = int(PADDING_SECONDS * SAMPLE_RATE)
+    start = max(speech[0] * frame - padding, 0)
+    end = min((speech[-1] + 1) * frame + padding, len(samples))
+
+    chunk = int(CHUNK_SECONDS * SAMPLE_RATE)
+    search = int(CUT_SEARCH_SECONDS * SAMPLE_RATE)
+    overlap = int(OVERLAP_SECONDS * SAMPLE_RATE)
+
+    ranges = []
+    while end - start > chunk:
+        # Quietest frame in the last CUT_SEARCH_SECONDS of the chunk
+        first_frame = (start + chunk - search) // frame
+        last_frame = (start + chunk) // frame
+        cut = (first_frame + int(np.argmin(energy[first_frame:last_frame]))) * frame
+        ranges.append((start, cut))
+        start = max(cut - overlap, start + frame)  # always move forward
+    ranges.append((start, end))
+    return ranges
+
+
+def write_wav(path: str, samples) -> None:
+    pcm = (np.clip(samples, -1.0, 1.0) * 32767).astype(np.int16)
+    with wave.open(path, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(SAMPLE_RATE)
+        wav.writeframes(pcm.tobytes())
+
+
+def prepare_chunks(audio_path: str, output_dir: str) -> list[str] | None:
+    """
+    Local audio stage: decode, downmix to 16 kHz mono, trim silence and
+    write the speech as overlapping WAV chunks. Returns the chunk paths in
+    order ([] for a silent recording), or None when the recording can't
+    be processed locally and should be sent as-is.
+    """
+    samples = load_audio(audio_path)
+    if samples is None:
+        return None
+
+    os.makedirs(output_dir, exist_ok=True)
+    paths = []
+    for i, (start, end) in enumerate(split_speech(samples)):
+        path = os.path.join(output_dir, f"chunk_{i:03d}.wav")
+        write_wav(path, samples[start:end])
+        paths.append(path)
+    return paths
+
+
+def stitch_transcripts(texts: list[str], max_overlap_words: int = 12) -> str:
+    """
+    Join chunk transcripts in order, dropping the words repeated at the
+    start of a chunk because of the audio overlap.
+    """
+    words: list[str] = []
+    for text in texts:
+        new_words = text.split()
+        best = 0
+        for size in range(min(max_overlap_words, len(words), len(new_words)), 0, -1):
+            tail = [w.lower().strip(".,!?") for w in words[-size:]]
+            head = [w.lower().strip(".,!?") for w in new_words[:size]]
+            if tail == head:
+                best = size
+                break
+        words.extend(new_words[best:])
+    return " ".join(words)
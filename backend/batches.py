@@ -0,0 +1,184 @@
+import json
+import os
+import posixpath
+import shutil
+import zipfile
+
+from jobs import new_job_id
+from projects import is_valid_project_id
+from uploads import MAX_AUDIO_BYTES, MAX_IMAGE_BYTES, MAX_IMAGES, sniff_kind
+from workspace import create_workspace, release_workspace
+
+# Sessions accepted in one batch archive
+MAX_BATCH_SESSIONS = int(os.getenv("SPECTER_MAX_BATCH_SESSIONS", "100"))
+# Optional file at the archive root describing the sessions
+BATCH_MANIFEST = "manifest.json"
+
+
+def _safe_name(name: str) -> bool:
+    parts = name.split("/")
+    return not name.startswith("/") and ".." not in parts and "\\" not in name
+
+
+def _member_kinds(zf: zipfile.ZipFile) -> dict[str, str]:
+    """
+    Kind ("image" / "audio") of every usable file in the archive, from its
+    first bytes. Hidden files, folders and anything else are ignored.
+    """
+    kinds = {}
+    for info in zf.infolist():
+        base = posixpath.basename(info.filename)
+        if info.is_dir() or not base or base.startswith(".") or "__MACOSX" in info.filename:
+            continue
+        if not _safe_name(info.filename):
+            continue
+        with zf.open(info) as f:
+            kind = sniff_kind(f.read(16))
+        if kind is not None:
+            kinds[info.filename] = kind
+    return kinds
+
+
+def _sessions_from_manifest(zf: zipfile.ZipFile, kinds: dict[str, str]) -> list[dict]:
+    try:
+        data = json.loads(zf.read(BATCH_MANIFEST))
+        entries = data["sessions"] if isinstance(data, dict) else data
+    except (ValueError, KeyError) as e:
+        raise ValueError(f"Invalid {BATCH_MANIFEST}: {e}")
+    if not isinstance(entries, list) or not all(isinstance(entry, dict) for entry in entries):
+        raise ValueError(f"Invalid {BATCH_MANIFEST}: sessions must be a list of objects.")
+    sessions = []
+    for i, entry in enumerate(entries):
+        images = entry.get("images") or ([entry["image"]] if entry.get("image") else [])
+        audio = entry.get("audio")
+        for member, kind in [(image, "image") for image in images] + ([(audio, "audio")] if audio else []):
+            if kinds.get(member) != kind:
+                raise ValueError(f"Session {i}: '{member}' is not an {kind} file of the archive.")
+        sessions.append({
+            "name": str(entry.get("name") or f"session-{i + 1}"),
+            "images": images,
+            "audio": audio,
+            "project_id": entry.get("project_id"),
+        })
+    return sessions
+
+
+def _sessions_from_layout(kinds: dict[str, str]) -> list[dict]:
+    """
+    One session per top-level folder; files at the root are grouped by
+    name stem ("board1.jpg" + "board1.wav").
+    """
+    groups: dict[str, list[str]] = {}
+    for member in sorted(kinds):
+        if "/" in member:
+            key = member.split("/", 1)[0]
+        else:
+            key = posixpath.splitext(member)[0]
+        groups.setdefault(key, []).append(member)
+
+    sessions = []
+    for name, members in groups.items():
+        images = [m for m in members if kinds[m] == "image"]
+        audios = [m for m in members if kinds[m] == "audio"]
+        sessions.append({
+            "name": name,
+            "images": images,
+            "audio": audios[0] if audios else None,
+            "project_id": None,
+        })
+    return sessions
+
+
+def read_sessions(zf: zipfile.ZipFile) -> list[dict]:
+    """
+    Sessions of a batch archive: [{"name", "images", "audio", "project_id"}]
+    with archive member names. Taken from manifest.json when the archive
+    has one ({"sessions": [{"name", "images", "audio", "project_id"}]}),
+    else from its layout. Raises ValueError for an unusable archive.
+    """
+    kinds = _member_kinds(zf)
+    if BATCH_MANIFEST in zf.namelist():
+        sessions = _sessions_from_manifest(zf, kinds)
+    else:
+        sessions = _sessions_from_layout(kinds)
+
+    sessions = [s for s in sessions if s["images"] or s["audio"]]
+    if not sessions:
+        raise ValueError("The archive contains no image or audio files.")
+    if len(sessions) > MAX_BATCH_SESSIONS:
+        raise ValueError(f"At most {MAX_BATCH_SESSIONS} sessions per batch.")
+    project_ids = set()
+    for session in sessions:
+        if len(session["images"]) > MAX_IMAGES:
+            raise ValueError(f"Session '{session['name']}': at most {MAX_IMAGES} images.")
+        if session["project_id"] is None:
+            continue
+        # Manifests may give ids as numbers: the rest of the code wants strings
+        session["project_id"] = str(session["project_id"])
+        if not is_valid_project_id(session["project_id"]):
+            raise ValueError(f"Session '{session['name']}': invalid project id.")
+        # Sessions run concurrently: two of them would race on one project's saved state
+        if session["project_id"] in project_ids:
+            raise ValueError(f"Session '{session['name']}': project id '{session['project_id']}' is used by another session.")
+        project_ids.add(session["project_id"])
+    return sessions
+
+
+def _extract(zf: zipfile.ZipFile, member: str, path: str, max_bytes: int) -> None:
+    copied = 0
+    with zf.open(member) as src, open(path, "wb") as dst:
+        for chunk in iter(lambda: src.read(1 << 20), b""):
+            copied += len(chunk)
+            if copied > max_bytes:
+                raise ValueError(f"'{member}' is larger than {max_bytes >> 20} MB.")
+            dst.write(chunk)
+
+
+def extract_session(zf: zipfile.ZipFile, session: dict, workspace: str) -> tuple[list[str], str | None]:
+    """
+    Write a session's inputs into a job workspace, named like /process
+    uploads. Returns (image paths, audio path or None).
+    """
+    if len(session["images"]) == 1:
+        image_paths = [os.path.join(workspace, "input_image.jpg")]
+    else:
+        image_paths = [os.path.join(workspace, f"input_image_{i:02d}.jpg") for i in range(len(session["images"]))]
+    for member, path in zip(session["images"], image_paths):
+        _extract(zf, member, path, MAX_IMAGE_BYTES)
+
+    audio_path = None
+    if session["audio"]:
+        audio_path = os.path.join(workspace, "input_audio.wav")
+        _extract(zf, session["audio"], audio_path, MAX_AUDIO_BYTES)
+    return image_paths, audio_path
+
+
+def prepare_batch(zip_path: str) -> list[dict]:
+    """
+    Read a batch archive and give each session its own job id and
+    workspace holding its inputs. Returns the sessions with "job_id",
+    "image_paths" and "audio_path" added. Nothing is left behind if the
+    archive is rejected (ValueError).
+    """
+    created = []
+    try:
+        with zipfile.ZipFile(zip_path) as zf:
+            sessions = read_sessions(zf)
+            for session in sessions:
+                session["job_id"] = new_job_id()
+                workspace = create_workspace(session["job_id"])
+                created.append(workspace)
+                session["image_paths"], session["audio_path"] = extract_session(zf, session, workspace)
+    except zipfile.BadZipFile as e:
+        _remove_workspaces(created)
+        raise ValueError(f"Invalid archive: {e}")
+    except Exception:
+        _remove_workspaces(created)
+        raise
+    return sessions
+
+
+def _remove_workspaces(paths: list[str]) -> None:
+    for path in paths:
+        release_workspace(path)
+        shutil.rmtree(path, ignore_errors=True)
@@ -0,0 +1,600 @@
+"""
+Offline end-to-end benchmark of /process.
+
+Runs the FastAPI app in-process against deterministic local stand-ins for
+every external service (the OpenAI-compatible LLM, the OCR / whisper / Kimi
+Spaces, Tavily and the scraped websites), each with configurable latency,
+then drives it at several concurrency levels and reports latency
+percentiles, throughput, peak RSS and per-stage timings. No network and
+no API keys are needed:
+
+    python bench.py --concurrency 1,4,8 --requests 16
+    python bench.py --llm-latency 0 --ocr-latency 0 --json bench.json
+"""
+
+import argparse
+import array
+import hashlib
+import io
+import json
+import math
+import os
+import random
+import re
+import resource
+import socket
+import sys
+import tempfile
+import threading
+import time
+import wave
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+try:
+    from PIL import Image, ImageDraw
+except ImportError:
+    Image = None
+
+FAKE_IDEA = "A shared grocery list app for roommates with budget tracking and recipe suggestions"
+FAKE_PROJECT = "BenchProject"
+
+
+class Latency:
+    """
+    Injected latency per fake service, in seconds, with optional jitter
+    drawn from a seeded generator so runs are repeatable.
+    """
+
+    def __init__(self, delays: dict[str, float], jitter: float = 0.0, seed: int = 0):
+        self.delays = delays
+        self.jitter = jitter
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def wait(self, service: str) -> None:
+        delay = self.delays.get(service, 0.0)
+        if delay <= 0:
+            return
+        with self._lock:
+            factor = 1 + self._random.uniform(-self.jitter, self.jitter)
+        time.sleep(delay * factor)
+
+
+# Fake LLM (OpenAI chat completions) -----------------------------------------
+
+def _text(content) -> str:
+    if isinstance(content, list):
+        return " ".join(part.get("text", "") for part in content if isinstance(part, dict))
+    return content or ""
+
+
+def _fake_files() -> dict[str, str]:
+    body = "\n".join(f"    # step {i}: keep the list in sync" for i in range(40))
+    return {
+        f"{FAKE_PROJECT}/backend/server.py": f"def start_server(host, port):\n{body}\n    return host, port\n",
+        f"{FAKE_PROJECT}/backend/budget.py": f"def track_budget(items):\n{body}\n    return sum(items)\n",
+        f"{FAKE_PROJECT}/frontend/index.html": "<!doctype html>\n<html><body><div id=\"app\"></div></body></html>\n",
+        f"{FAKE_PROJECT}/frontend/app.js": f"function renderList(items) {{\n{body}\n}}\n",
+        f"{FAKE_PROJECT}/README.md": "# BenchProject\n\nGenerated by the benchmark stand-in LLM.\n",
+    }
+
+
+def _fake_structure() -> str:
+    return json.dumps({
+        "backend": {
+            f"{FAKE_PROJECT}/backend/server.py": "HTTP server",
+            f"{FAKE_PROJECT}/backend/budget.py": "Budget tracking",
+            "functions": [{"name": "start_server", "args": ["host", "port"], "description": "Start the server."}],
+        },
+        "frontend": {
+            f"{FAKE_PROJECT}/frontend/index.html": "Page shell",
+            f"{FAKE_PROJECT}/frontend/app.js": "List rendering",
+            "functions": [{"name": "renderList", "args": ["items"], "description": "Render the list."}],
+        },
+        "docs": {
+            f"{FAKE_PROJECT}/README.md": "How to run the project",
+        },
+    })
+
+
+def _tool_call(name: str, **arguments) -> dict:
+    return {"tool": name, "arguments": arguments}
+
+
+def fake_llm_reply(messages: list[dict], tool_names: set[str]) -> dict:
+    """
+    Scripted reply of the stand-in LLM: walks each agent through the same
+    tool calls a real model makes, based on the tools it was given and the
+    tool results so far. Returns {"content": ...} or {"tool": ..., "arguments": ...}.
+    """
+    last_user = max((i for i, m in enumerate(messages) if m.get("role") == "user"), default=-1)
+    request = _text(messages[last_user]["content"]) if last_user >= 0 else ""
+    results = [_text(m.get("content")) for m in messages[last_user + 1:] if m.get("role") == "tool"]
+
+    if "extract_handwriting" in tool_names:
+        if not results:
+            return _tool_call("extract_handwriting", image_url=request.rsplit("image URL: ", 1)[-1].strip())
+        return {"content": f"Extracted text: {results[-1].replace(':', ' ')}"}
+
+    if "extract_audio" in tool_names:
+        if not results:
+            return _tool_call("extract_audio", audio_path=request.rsplit("audio file: ", 1)[-1].strip())
+        return {"content": f"Transcription: {results[-1].replace(':', ' ')}"}
+
+    if "enrich_idea" in tool_names:
+        if not results:
+            return _tool_call("enrich_idea", idea=request)
+        return {"content": results[-1]}
+
+    if "save_to_txt" in tool_names:
+        if len(results) == 0:
+            return _tool_call("search", query="shared grocery list app for roommates")
+        if len(results) == 1:
+            urls = re.findall(r"https?://[^\s'\",\]]+", results[0])
+            return _tool_call("scrape_websites", urls=",".join(urls))
+        if len(results) == 2:
+            analysis = (
+                f"Extracted Idea: {FAKE_IDEA}.\n\n"
+                "Competitor Summaries: " + " ".join(results[1].split()[:200])
+            )
+            return _tool_call("save_to_txt", data=analysis)
+        return {"content": "The analysis is complete and has been saved."}
+
+    if "write_files" in tool_names:
+        if "PLANNING ONLY" in request or results:
+            return {"content": _fake_structure()}
+        return _tool_call("write_files", files=json.dumps(_fake_files()))
+
+    return {"content": "OK"}
+
+
+def _completion(reply: dict, model: str, prompt_chars: int) -> dict:
+    message = {"role": "assistant", "content": reply.get("content")}
+    finish_reason = "stop"
+    if "tool" in reply:
+        call_id = "call_" + hashlib.sha1(json.dumps(reply, sort_keys=True).encode()).hexdigest()[:12]
+        message["tool_calls"] = [{
+            "id": call_id,
+            "type": "function",
+            "function": {"name": reply["tool"], "arguments": json.dumps(reply["arguments"])},
+        }]
+        finish_reason = "tool_calls"
+
+    # Rough token counts, ~4 characters per token
+    completion_chars = len(json.dumps(message))
+    return {
+        "id": "chatcmpl-bench",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "message": message, "finish_reason": finish_reason}],
+        "usage": {
+            "prompt_tokens": prompt_chars // 4,
+            "completion_tokens": completion_chars // 4,
+            "total_tokens": (prompt_chars + completion_chars) // 4,
+        },
+    }
+
+
+def _stream_chunks(completion: dict) -> list[dict]:
+    choice = completion["choices"][0]
+    delta = {"role": "assistant", "content": choice["message"]["content"]}
+    if "tool_calls" in choice["message"]:
+        delta["tool_calls"] = [dict(call, index=i) for i, call in enumerate(choice["message"]["tool_calls"])]
+    base = {k: completion[k] for k in ("id", "created", "model")}
+    return [
+        dict(base, object="chat.completion.chunk", choices=[{"index": 0, "delta": delta, "finish_reason": None}]),
+        dict(base, object="chat.completion.chunk", usage=completion["usage"],
+             choices=[{"index": 0, "delta": {}, "finish_reason": choice["finish_reason"]}]),
+    ]
+
+
+# Fake websites --------------------------------------------------------------
+
+def fake_page(site: int) -> str:
+    paragraphs = "\n".join(
+        f"<p>Competitor {site} helps roommates split groceries, feature {i}, with shared budgets and reminders.</p>"
+        for i in range(60)
+    )
+    return (
+        f"<html><head><title>Competitor {site}</title><style>p {{ margin: 0 }}</style></head>"
+        f"<body><script>var tracking = {site};</script><nav>Home Pricing About</nav>{paragraphs}"
+        "<footer>Copyright Competitor Inc.</footer></body></html>"
+    )
+
+
+class FakeServices:
+    """
+    One local HTTP server standing in for the LLM endpoint and for every
+    website the competition agent scrapes.
+    """
+
+    def __init__(self, latency: Latency):
+        self.latency = latency
+        self.llm_calls = 0
+        self.page_hits = 0
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self.server.daemon_threads = True
+        self.base_url = f"http://127.0.0.1:{self.server.server_port}"
+
+    def start(self) -> None:
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def stop(self) -> None:
+        self.server.shutdown()
+
+    def _handler(self):
+        services = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status: int, body: bytes, content_type: str) -> None:
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                match = re.match(r"/site/(\d+)", self.path)
+                if not match:
+                    self._send(404, b"not found", "text/plain")
+                    return
+                services.latency.wait("site")
+                with services._lock:
+                    services.page_hits += 1
+                self._send(200, fake_page(int(match.group(1))).encode(), "text/html; charset=utf-8")
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                if not self.path.rstrip("/").endswith("chat/completions"):
+                    self._send(404, b'{"error": "not found"}', "application/json")
+                    return
+                request = json.loads(body or b"{}")
+                tool_names = {t.get("function", {}).get("name") for t in request.get("tools") or []}
+                reply = fake_llm_reply(request.get("messages", []), tool_names)
+                services.latency.wait("llm")
+                with services._lock:
+                    services.llm_calls += 1
+
+                completion = _completion(reply, request.get("model", "bench"), len(body))
+                if not request.get("stream"):
+                    self._send(200, json.dumps(completion).encode(), "application/json")
+                    return
+                events = "".join(f"data: {json.dumps(chunk)}\n\n" for chunk in _stream_chunks(completion))
+                self._send(200, (events + "data: [DONE]\n\n").encode(), "text/event-stream")
+
+        return Handler
+
+
+# Fake Gradio Spaces and Tavily ---------------------------------------------
+
+def make_fake_gradio_client(latency: Latency):
+    """
+    Class replacing gradio_client.Client for the Spaces in clients.SPACES.
+    """
+    from clients import SPACES
+    space_names = {space: name for name, (space, _) in SPACES.items()}
+
+    class FakeJob:
+        def __init__(self, run):
+            self._run = run
+
+        def result(self, timeout: float | None = None):
+            return self._run()
+
+        def cancel(self) -> bool:
+            return False
+
+    class FakeGradioClient:
+        def __init__(self, space: str, token: str | None = None, **kwargs):
+            self.name = space_names.get(space, space)
+            latency.wait("connect")
+
+        def submit(self, *args, api_name: str | None = None, **kwargs):
+            return FakeJob(lambda: self.predict(*args, api_name=api_name, **kwargs))
+
+        def predict(self, *args, api_name: str | None = None, **kwargs):
+            latency.wait(self.name)
+            if self.name == "ocr":
+                if api_name == "/load_image":
+                    return args[0]
+                md_text = f"# Whiteboard\n{FAKE_IDEA}\nshared list, budget per roommate, recipe ideas"
+                return md_text, md_text, None, None, []
+            if self.name == "whisper":
+                return "we want roommates to share one grocery list and see who spent what this month"
+            if self.name == "kimi":
+                idea = kwargs.get("system_prompt", "")[-200:]
+                summary = (
+                    f"{FAKE_PROJECT} is a web app where roommates keep one shared grocery list. "
+                    f"It tracks each person's spending against a monthly budget and suggests recipes. "
+                    f"Input was: {' '.join(idea.split())}"
+                )
+                return [[["idea", f"Thinking about the idea. Summary\n{summary}"]]]
+            raise ValueError(f"Unexpected Space {self.name}")
+
+    return FakeGradioClient
+
+
+def make_fake_tavily_client(latency: Latency, base_url: str, results: int = 5):
+    class FakeTavilyClient:
+        def __init__(self, api_key: str | None = None, **kwargs):
+            pass
+
+        def search(self, query: str, **kwargs) -> dict:
+            latency.wait("search")
+            seed = int(hashlib.sha1(query.encode()).hexdigest()[:8], 16)
+            return {"query": query, "results": [
+                {"url": f"{base_url}/site/{(seed + i) % 50}", "title": f"Competitor {(seed + i) % 50}"}
+                for i in range(results)
+            ]}
+
+    return FakeTavilyClient
+
+
+# Inputs ---------------------------------------------------------------------
+
+def make_image(sample_path: str, variant: int) -> bytes:
+    """
+    The sample whiteboard photo, made unique per request so caches can be
+    defeated. Preprocessing decodes and re-encodes images, so the variant
+    is drawn into the pixels: a dark mark whose position encodes it, near
+    the centre so cropping to the board keeps it.
+    """
+    with open(sample_path, "rb") as f:
+        data = f.read()
+    if Image is None:
+        # Without Pillow the server sends uploads to OCR as they are
+        return data + f"bench-{variant}".encode()
+
+    with Image.open(io.BytesIO(data)) as img:
+        img = img.convert("RGB")
+    # Marks big enough to survive the downsampling to OCR_MAX_SIDE, on a
+    # grid over the centre; two of them, for variant // cells and
+    # variant % cells, in its upper and lower half
+    size = max(8, max(img.size) // 64)
+    columns = max(1, img.width // 2 // (2 * size))
+    rows = max(1, img.height // 4 // (2 * size))
+    cells = columns * rows
+    draw = ImageDraw.Draw(img)
+    for half, cell in enumerate(((variant // cells) % cells, variant % cells)):
+        x = img.width // 4 + (cell % columns) * 2 * size
+        y = img.height // 4 + half * img.height // 4 + (cell // columns) * 2 * size
+        draw.rectangle((x, y, x + size, y + size), fill=(20, 20, 20))
+    out = io.BytesIO()
+    img.save(out, "JPEG", quality=90)
+    return out.getvalue()
+
+
+def make_audio(seconds: float, variant: int, rate: int = 22050) -> bytes:
+    """
+    Stereo WAV with bursts of tone separated by silence, like speech with
+    pauses. The pitch varies per request.
+    """
+    pitch = 180 + variant % 97
+    samples = array.array("h", (
+        int(9830 * math.sin(2 * math.pi * pitch * n / rate)) if (n / rate) % 4.0 < 3.0 else 0
+        for n in range(int(seconds * rate))
+    ))
+    # Same sample on both channels
+    frames = array.array("h", bytes(len(samples) * 4))
+    frames[0::2] = samples
+    frames[1::2] = samples
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(2)
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        wav.writeframes(frames.tobytes())
+    return buffer.getvalue()
+
+
+# Driver ---------------------------------------------------------------------
+
+def percentile(values: list[float], q: float) -> float | None:
+    """
+    Nearest-rank percentile, q in [0, 100].
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(math.ceil(q / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+def peak_rss_mb() -> dict:
+    # ru_maxrss is in KiB on Linux
+    return {
+        "server": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "workers": round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024, 1),
+    }
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def run_one(session, api_url: str, images: list[bytes], audio: bytes, poll: float) -> dict:
+    start = time.perf_counter()
+    files = [("images", (f"board{i}.jpg", image, "image/jpeg")) for i, image in enumerate(images)]
+    files.append(("audio", ("idea.wav", audio, "audio/wav")))
+    response = session.post(f"{api_url}/process", files=files)
+    response.raise_for_status()
+    job_id = response.json()["job_id"]
+
+    while True:
+        status = session.get(f"{api_url}/jobs/{job_id}").json()["status"]
+        if status in ("done", "failed"):
+            break
+        time.sleep(poll)
+    latency = time.perf_counter() - start
+
+    run_info = {}
+    if status == "done":
+        run_info = session.get(f"{api_url}/jobs/{job_id}/result").json().get("run_info") or {}
+    return {"job_id": job_id, "status": status, "seconds": latency, "run_info": run_info}
+
+
+def run_level(api_url: str, concurrency: int, inputs: list[tuple[list[bytes], bytes]], poll: float) -> dict:
+    """
+    Run one job per (images, audio) input, `concurrency` at a time.
+    """
+    import requests
+
+    session = requests.Session()
+    session.mount("http://", requests.adapters.HTTPAdapter(pool_maxsize=concurrency))
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = [pool.submit(run_one, session, api_url, images, audio, poll) for images, audio in inputs]
+        runs = [future.result() for future in futures]
+    wall = time.perf_counter() - start
+
+    done = [run for run in runs if run["status"] == "done"]
+    latencies = [run["seconds"] for run in done]
+    stages: dict[str, list[float]] = {}
+    for run in done:
+        for stage, seconds in run["run_info"].get("stage_timings", {}).items():
+            stages.setdefault(stage, []).append(seconds)
+
+    return {
+        "concurrency": concurrency,
+        "requests": len(inputs),
+        "done": len(done),
+        "failed": len(runs) - len(done),
+        "wall_seconds": round(wall, 3),
+        "throughput_jobs_per_s": round(len(done) / wall, 3) if wall else None,
+        "latency_p50": percentile(latencies, 50),
+        "latency_p95": percentile(latencies, 95),
+        "latency_max": max(latencies, default=None),
+        "stages": {
+            stage: {"p50": percentile(values, 50), "p95": percentile(values, 95)}
+            for stage, values in stages.items()
+        },
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def _fmt(value) -> str:
+    return "-" if value is None else f"{value:.3f}"
+
+
+def print_report(levels: list[dict]) -> None:
+    print()
+    print(f"{'conc':>5} {'ok':>4} {'fail':>4} {'p50 s':>8} {'p95 s':>8} {'max s':>8} {'jobs/s':>8} {'rss MB':>8}")
+    for level in levels:
+        print(
+            f"{level['concurrency']:>5} {level['done']:>4} {level['failed']:>4} "
+            f"{_fmt(level['latency_p50']):>8} {_fmt(level['latency_p95']):>8} {_fmt(level['latency_max']):>8} "
+            f"{_fmt(level['throughput_jobs_per_s']):>8} {level['peak_rss_mb']['server']:>8}"
+        )
+    for level in levels:
+        print(f"\nStages at concurrency {level['concurrency']} (p50 / p95 s):")
+        for stage, stats in level["stages"].items():
+            print(f"  {stage:<18} {_fmt(stats['p50']):>8} {_fmt(stats['p95']):>8}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", default="1,4,8", help="comma-separated client concurrency levels")
+    parser.add_argument("--requests", type=int, default=8, help="jobs submitted per concurrency level")
+    parser.add_argument("--workers", type=int, default=None, help="server job workers (SPECTER_WORKERS)")
+    parser.add_argument("--warm-cache", action="store_true", help="send identical inputs so the result caches are hit")
+    parser.add_argument("--audio-seconds", type=float, default=20.0)
+    parser.add_argument("--images", type=int, default=1, help="whiteboard photos per job")
+    parser.add_argument("--image", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "input_image.jpg"))
+    parser.add_argument("--poll", type=float, default=0.1, help="job status poll interval in seconds")
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="seconds per chat completion")
+    parser.add_argument("--ocr-latency", type=float, default=1.0)
+    parser.add_argument("--whisper-latency", type=float, default=0.5, help="seconds per transcribed chunk")
+    parser.add_argument("--kimi-latency", type=float, default=0.8)
+    parser.add_argument("--connect-latency", type=float, default=0.3, help="seconds to connect a Space client")
+    parser.add_argument("--search-latency", type=float, default=0.3)
+    parser.add_argument("--site-latency", type=float, default=0.1, help="seconds per scraped page")
+    parser.add_argument("--jitter", type=float, default=0.0, help="relative latency jitter, e.g. 0.2 for +/-20%%")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="also write the report to this file")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    levels = [int(c) for c in args.concurrency.split(",") if c.strip()]
+    latency = Latency({
+        "llm": args.llm_latency,
+        "ocr": args.ocr_latency,
+        "whisper": args.whisper_latency,
+        "kimi": args.kimi_latency,
+        "connect": args.connect_latency,
+        "search": args.search_latency,
+        "site": args.site_latency,
+    }, jitter=args.jitter, seed=args.seed)
+
+    fakes = FakeServices(latency)
+    fakes.start()
+
+    # Everything the server writes goes to a scratch directory, and every
+    # external service to the stand-ins; set before the app is imported
+    scratch = tempfile.mkdtemp(prefix="specter-bench-")
+    os.environ.update({
+        "SPECTER_LLM_URL": fakes.base_url,
+        "SPECTER_CACHE_DIR": os.path.join(scratch, "cache"),
+        "SPECTER_WORKSPACE_ROOT": os.path.join(scratch, "jobs"),
+        "SPECTER_PROJECTS_ROOT": os.path.join(scratch, "projects"),
+        "SPECTER_DB": os.path.join(scratch, "results.db"),
+        "OPENAI_API_KEY": "bench",
+        "TAVILY_API_KEY": "bench",
+        "HF_TOKEN": "bench",
+    })
+    if args.workers:
+        os.environ["SPECTER_WORKERS"] = str(args.workers)
+
+    import clients
+    import web
+    clients.Client = make_fake_gradio_client(latency)
+    web.TavilyClient = make_fake_tavily_client(latency, fakes.base_url)
+
+    import uvicorn
+    from main import app
+
+    port = _free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    api_url = f"http://127.0.0.1:{port}"
+
+    report = []
+    try:
+        for concurrency in levels:
+            print(f"Concurrency {concurrency}: {args.requests} jobs")
+            # Unique inputs per job unless the caches are meant to be hit
+            variants = [0 if args.warm_cache else len(report) * args.requests + i for i in range(args.requests)]
+            inputs = [
+                ([make_image(args.image, v * args.images + board) for board in range(args.images)],
+                 make_audio(args.audio_seconds, v))
+                for v in variants
+            ]
+            report.append(run_level(api_url, concurrency, inputs, args.poll))
+    finally:
+        server.should_exit = True
+        fakes.stop()
+
+    print_report(report)
+    print(f"\nFake LLM calls: {fakes.llm_calls}, pages served: {fakes.page_hits}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"args": vars(args), "levels": report}, f, indent=2)
+    return 0 if all(level["failed"] == 0 for level in report) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
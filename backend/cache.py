@@ -0,0 +1,207 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+CACHE_DIR = os.getenv("SPECTER_CACHE_DIR", ".specter_cache")
+
+
+# SHA-256 of files already hashed (or hashed while uploaded), keyed by
+# path, size and mtime so a file that changed is read again
+MAX_KNOWN_HASHES = 1024
+_known_hashes: dict[tuple, str] = {}
+_known_hashes_lock = threading.Lock()
+
+
+def _file_identity(path: str) -> tuple:
+    st = os.stat(path)
+    return os.path.abspath(path), st.st_size, st.st_mtime_ns
+
+
+def remember_file_hash(path: str, digest: str) -> None:
+    identity = _file_identity(path)
+    with _known_hashes_lock:
+        if len(_known_hashes) >= MAX_KNOWN_HASHES:
+            _known_hashes.clear()
+        _known_hashes[identity] = digest
+
+
+def hash_file(path: str, chunk_size: int = 1 << 20) -> str:
+    """
+    SHA-256 of a file's content, read in chunks (once per file version).
+    """
+    identity = _file_identity(path)
+    with _known_hashes_lock:
+        known = _known_hashes.get(identity)
+    if known is not None:
+        return known
+
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    remember_file_hash(path, digest.hexdigest())
+    return digest.hexdigest()
+
+
+def make_key(*parts) -> str:
+    """
+    Stable cache key from JSON-serializable parts (content hash, model id,
+    mode, prompt, ...).
+    """
+    raw = json.dumps(parts, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """
+    Two-tier cache for JSON-serializable results: an in-memory LRU of
+    `max_entries` in front of a directory of JSON files capped at
+    `max_disk_bytes` (least recently used files are evicted first).
+    With `max_memory_bytes`, the in-memory tier is also capped by the
+    serialized size of its entries. With `ttl_seconds`, entries also
+    expire that long after being set.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_entries: int = 256,
+        max_disk_bytes: int = 64 << 20,
+        ttl_seconds: float | None = None,
+        max_memory_bytes: int | None = None,
+    ):
+        self.name = name
+        self.directory = os.path.join(CACHE_DIR, name)
+        self.max_entries = max_entries
+        self.max_disk_bytes = max_disk_bytes
+        self.ttl_seconds = ttl_seconds
+        self.max_memory_bytes = max_memory_bytes
+        self.hits = 0
+        self.misses = 0
+        # key -> (value, expires_at or None, serialized size)
+        self._memory: OrderedDict[str, tuple[object, float | None, int]] = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def _forget(self, key: str) -> None:
+        self._memory_bytes -= self._memory.pop(key)[2]
+
+    def _remember(self, key: str, value, expires_at: float | None, size: int) -> None:
+        if key in self._memory:
+            self._forget(key)
+        if self.max_memory_bytes is not None and size > self.max_memory_bytes:
+            return  # only kept on disk
+        self._memory[key] = (value, expires_at, size)
+        self._memory_bytes += size
+        while len(self._memory) > self.max_entries or (
+            self.max_memory_bytes is not None and self._memory_bytes > self.max_memory_bytes
+        ):
+            self._forget(next(iter(self._memory)))
+
+    @staticmethod
+    def _expired(expires_at: float | None) -> bool:
+        return expires_at is not None and expires_at <= time.time()
+
+    def _read_disk(self, key: str) -> tuple[object, float | None, int] | None:
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                raw = f.read()
+            entry = json.loads(raw)
+            value, expires_at = entry["value"], entry.get("expires_at")
+        except (OSError, ValueError, KeyError):
+            return None
+
+        if self._expired(expires_at):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        os.utime(path)  # mark as recently used for disk eviction
+        return value, expires_at, len(raw)
+
+    def _lookup(self, key: str, count: bool):
+        with self._lock:
+            if key in self._memory:
+                value, expires_at, _ = self._memory[key]
+                if not self._expired(expires_at):
+                    self._memory.move_to_end(key)
+                    self.hits += count
+                    return value
+                self._forget(key)
+
+        entry = self._read_disk(key)
+        with self._lock:
+            if entry is None:
+                self.misses += count
+                return None
+            self._remember(key, *entry)
+            self.hits += count
+            return entry[0]
+
+    def get(self, key: str):
+        """
+        Cached value for key, or None.
+        """
+        return self._lookup(key, count=True)
+
+    def __contains__(self, key: str) -> bool:
+        return self._lookup(key, count=False) is not None
+
+    def set(self, key: str, value) -> None:
+        expires_at = time.time() + self.ttl_seconds if self.ttl_seconds else None
+        raw = json.dumps({"value": value, "expires_at": expires_at}, ensure_ascii=False)
+        with self._lock:
+            self._remember(key, value, expires_at, len(raw))
+
+        path = self._path(key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(raw)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Could not write {self.name} cache entry: {e}")
+            return
+        self._evict_disk()
+
+    def _evict_disk(self) -> None:
+        entries = []
+        total = 0
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if not entry.name.endswith(".json"):
+                    continue
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue  # evicted by another thread meanwhile
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_disk_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self._memory),
+                "memory_bytes": self._memory_bytes,
+            }
@@ -0,0 +1,140 @@
+import os
+import queue
+import threading
+import traceback
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from contextlib import contextmanager
+
+from gradio_client import Client
+
+from upstream import call_upstream
+
+# Hugging Face Spaces used by the tools: name -> (space id, needs HF token)
+SPACES = {
+    "ocr": ("LauzHack/DeepSeek-OCR", True),
+    "whisper": ("LauzHack/whisper", False),
+    "kimi": ("LauzHack/Kimi-VL-A3B-Thinking", True),
+}
+
+# Connected clients kept per Space. This is also the maximum number of
+# concurrent predictions we send to one Space.
+CLIENTS_PER_SPACE = int(os.getenv("SPECTER_CLIENTS_PER_SPACE", "2"))
+
+
+class ClientPool:
+    """
+    A small pool of connected gradio clients for one Space. Connecting
+    fetches the Space config, so clients are created once and reused.
+    """
+
+    def __init__(self, space: str, size: int, use_token: bool = False):
+        self.space = space
+        self.size = size
+        self.use_token = use_token
+        self._idle: queue.Queue = queue.Queue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def _connect(self) -> Client:
+        print(f"Connecting to Space {self.space}")
+        # Read at connect time: .env is loaded after this module is imported
+        token = os.getenv("HF_TOKEN") if self.use_token else None
+        return Client(self.space, token=token)
+
+    def _try_reserve(self) -> bool:
+        with self._lock:
+            if self._created >= self.size:
+                return False
+            self._created += 1
+            return True
+
+    def _new_client(self) -> Client:
+        try:
+            return self._connect()
+        except Exception:
+            with self._lock:
+                self._created -= 1
+            raise
+
+    def warm(self) -> None:
+        """
+        Open connections until the pool is full.
+        """
+        while self._try_reserve():
+            self._idle.put(self._new_client())
+
+    def stats(self) -> dict:
+        with self._lock:
+            created = self._created
+        idle = self._idle.qsize()
+        return {"limit": self.size, "in_flight": created - idle, "connected": created}
+
+    @contextmanager
+    def acquire(self):
+        """
+        Borrow a client, blocking while `size` clients are already in use.
+        """
+        try:
+            client = self._idle.get_nowait()
+        except queue.Empty:
+            client = self._new_client() if self._try_reserve() else self._idle.get()
+
+        try:
+            yield client
+        finally:
+            self._idle.put(client)
+
+
+_pools = {
+    name: ClientPool(space, CLIENTS_PER_SPACE, use_token)
+    for name, (space, use_token) in SPACES.items()
+}
+
+
+def get_client(name: str):
+    """
+    Context manager borrowing a pooled client for one of SPACES:
+
+        with get_client("ocr") as client:
+            client.predict(...)
+    """
+    return _pools[name].acquire()
+
+
+def predict(name: str, *args, api_name: str, **kwargs):
+    """
+    Call an endpoint of one of SPACES through upstream.call_upstream: rate
+    limited, retried with backoff and circuit broken. Each attempt is
+    submitted as a job and cancelled when it runs past its timeout, so a
+    throttled Space can't hold a worker forever.
+    """
+    def attempt(timeout: float | None):
+        with get_client(name) as client:
+            job = client.submit(*args, api_name=api_name, **kwargs)
+            try:
+                return job.result(timeout=timeout)
+            except FutureTimeoutError:
+                job.cancel()
+                raise TimeoutError(f"{name} {api_name} timed out after {timeout:.0f}s")
+
+    return call_upstream(name, attempt)
+
+
+def warm_clients() -> None:
+    """
+    Connect every pool up front. A Space that is down is only logged: its
+    pool connects lazily on the next request instead.
+    """
+    for name, pool in _pools.items():
+        try:
+            pool.warm()
+        except Exception:
+            print(f"Could not warm up {name} clients ({pool.space})")
+            traceback.print_exc()
+
+
+def pool_stats() -> dict:
+    """
+    Clients of each Space in use, connected and allowed.
+    """
+    return {name: pool.stats() for name, pool in _pools.items()}
@@ -0,0 +1,179 @@
+import math
+import os
+import re
+from collections import Counter
+from contextvars import ContextVar
+
+# Characters of scraped material one competition analysis may hand to the
+# agent, across all its scrape calls (about a quarter as many tokens)
+CONTEXT_BUDGET_CHARS = int(os.getenv("SPECTER_COMPETITION_CONTEXT_CHARS", "12000"))
+# Characters kept per page at most, whatever the budget left
+PAGE_BUDGET_CHARS = int(os.getenv("SPECTER_COMPETITION_PAGE_CHARS", "1500"))
+# Page text read before compaction: more than is kept, to choose from
+SOURCE_PAGE_CHARS = 20000
+# Consecutive blocks of a page are grouped into passages of about this size
+PASSAGE_CHARS = 400
+# A page gets at least this much of the remaining budget, else nothing
+MIN_PAGE_CHARS = 200
+
+# Navigation, legal and cookie text found on every site
+BOILERPLATE = re.compile(
+    r"cookie|privacy policy|terms of (service|use)|all rights reserved|©|sign (in|up)|log ?in"
+    r"|subscribe to our newsletter|skip to (main )?content|accept all|javascript",
+    re.IGNORECASE,
+)
+STOPWORDS = set("""
+    a about above after all also an and any are as at be because been but by can could do does each
+    for from has have how if in into is it its may more most must no not of on one or other our out
+    over should so some such than that the their them then there these they this those through to
+    up use used user users uses using very was we what when where which while who will with would
+    you your
+""".split())
+
+# Compaction state of the competition analysis running in this context
+current_compactor: ContextVar["ContextCompactor | None"] = ContextVar("current_compactor", default=None)
+
+
+def _normalize_block(block: str) -> str:
+    return " ".join(re.sub(r"[^\w\s]", " ", block.lower()).split())
+
+
+def _terms(text: str) -> list[str]:
+    return [t for t in re.findall(r"[a-z0-9]+", text.lower()) if len(t) > 2 and t not in STOPWORDS]
+
+
+def _passages(blocks: list[str]) -> list[str]:
+    """
+    Group consecutive blocks into passages of about PASSAGE_CHARS, so a
+    heading stays with the text under it. Long blocks (pages cached as
+    one line) are split at sentence ends.
+    """
+    pieces = []
+    for block in blocks:
+        if len(block) <= PASSAGE_CHARS:
+            pieces.append(block)
+        else:
+            pieces.extend(s for s in re.split(r"(?<=[.!?])\s+", block) if s)
+
+    passages, current = [], ""
+    for piece in pieces:
+        if current and len(current) + len(piece) > PASSAGE_CHARS:
+            passages.append(current)
+            current = ""
+        current = f"{current} {piece}" if current else piece
+    if current:
+        passages.append(current)
+    return passages
+
+
+class ContextCompactor:
+    """
+    Sits between the competition agent's scrape tools and the agent. Each
+    page is reduced to its passages most relevant to the analysed project
+    (TF-IDF against the spec and the agent's search queries), with text
+    repeated across pages (menus, footers, cookie banners) dropped, and
+    everything the agent receives counts towards one budget: the prompt
+    stays bounded however many URLs are scraped.
+    """
+
+    def __init__(self, topic: str, budget_chars: int = CONTEXT_BUDGET_CHARS):
+        self.query = Counter(_terms(topic))
+        self.budget_chars = budget_chars
+        self.used_chars = 0
+        self.raw_chars = 0
+        self.seen_urls: set[str] = set()
+        # Normalized blocks of the pages compacted so far
+        self.seen_blocks: set[str] = set()
+
+    @property
+    def remaining(self) -> int:
+        return max(0, self.budget_chars - self.used_chars)
+
+    @property
+    def exhausted(self) -> bool:
+        return self.remaining < MIN_PAGE_CHARS
+
+    def add_query(self, query: str) -> None:
+        """
+        Terms the agent searched for weigh like the spec's.
+        """
+        self.query.update(_terms(query))
+
+    def _content_blocks(self, pages: list[str]) -> list[list[str]]:
+        """
+        Blocks (lines) of each page, without the ones already seen on an
+        earlier page of this analysis (site chrome, shared marketing copy)
+        and obvious navigation / legal text.
+        """
+        content = []
+        for text in pages:
+            kept, blocks = [], set()
+            for block in (b.strip() for b in text.splitlines()):
+                normalized = _normalize_block(block)
+                if not normalized or normalized in blocks or normalized in self.seen_blocks:
+                    continue
+                blocks.add(normalized)
+                if len(block) < 200 and BOILERPLATE.search(block):
+                    continue
+                kept.append(block)
+            # Lines repeated within one page are dropped too, but only
+            # other pages make a line boilerplate for the next ones
+            self.seen_blocks.update(blocks)
+            content.append(kept)
+        return content
+
+    def _select(self, passages: list[str], idf: dict[str, float], limit: int) -> str:
+        def score(passage: str) -> float:
+            counts = Counter(_terms(passage))
+            if not counts:
+                return 0.0
+            total = sum(
+                (1 + math.log(tf)) * idf.get(term, 0.0) * (1 + math.log(self.query[term]))
+                for term, tf in counts.items() if term in self.query
+            )
+            return total / math.sqrt(sum(counts.values()))
+
+        scores = [score(passage) for passage in passages]
+        # The lead passage usually says what the product is: keep it first
+        ranked = [0] + sorted(range(1, len(passages)), key=lambda i: scores[i], reverse=True)
+        chosen, size = [], 0
+        for i in ranked:
+            if i and scores[i] <= 0:
+                break
+            if size + len(passages[i]) > limit:
+                continue
+            chosen.append(i)
+            size += len(passages[i]) + 1
+        # In page order, so the text still reads naturally
+        return "\n".join(passages[i] for i in sorted(chosen))
+
+    def compact_pages(self, pages: list[tuple[str, str]]) -> list[tuple[str, str]]:
+        """
+        Compact the (url, text) pairs of one scrape call. Pages read before
+        in this analysis are not sent again, and once the budget is spent
+        pages are replaced by a note telling the agent to stop scraping.
+        """
+        fresh = {url: text for url, text in pages if url not in self.seen_urls}
+        self.seen_urls.update(fresh)
+        content = self._content_blocks(list(fresh.values()))
+        passages = {url: _passages(blocks) for url, blocks in zip(fresh, content)}
+
+        documents = [set(_terms(p)) for page in passages.values() for p in page]
+        df = Counter(term for terms in documents for term in terms)
+        idf = {term: math.log((len(documents) + 1) / (count + 1)) + 1 for term, count in df.items()}
+
+        # The budget left is shared evenly by the new pages
+        limit = min(PAGE_BUDGET_CHARS, self.remaining // max(1, len(passages)))
+        results = []
+        for url, _ in pages:
+            if url not in fresh:
+                results.append((url, "(already read earlier in this analysis)"))
+                continue
+            self.raw_chars += len(fresh.pop(url))
+            if limit < MIN_PAGE_CHARS:
+                results.append((url, "(context budget reached: write the analysis with the material gathered so far)"))
+                continue
+            compacted = self._select(passages[url], idf, limit) if passages[url] else ""
+            self.used_chars += len(compacted)
+            results.append((url, compacted or "(no relevant content)"))
+        return results
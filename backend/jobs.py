@@ -0,0 +1,203 @@
+import contextvars
+import os
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+# Number of pipelines that may run at the same time. Each job is mostly
+# waiting on remote LLM / Space calls, so threads are enough here.
+MAX_WORKERS = int(os.getenv("SPECTER_WORKERS", "4"))
+
+# Finished jobs are forgotten after this many seconds
+JOB_TTL_SECONDS = int(os.getenv("SPECTER_JOB_TTL", "3600"))
+
+# Jobs of a batch run on their own, wider pool: their concurrency is set
+# by the per-upstream limits (see upstream.py), not by job workers
+BATCH_WORKERS = int(os.getenv("SPECTER_BATCH_WORKERS", "16"))
+
+_executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="specter-job")
+_batch_executor = ThreadPoolExecutor(max_workers=BATCH_WORKERS, thread_name_prefix="specter-batch")
+_jobs: dict[str, dict] = {}
+# batch id -> {"id", "created_at", "sessions": [{"name", "job_id"}, ...]}
+_batches: dict[str, dict] = {}
+_lock = threading.Lock()
+
+# Id of the job running in the current context, so code deep inside the
+# pipeline (stages, tools) can report progress with emit_event()
+current_job_id: contextvars.ContextVar[str | None] = contextvars.ContextVar("current_job_id", default=None)
+
+
+def _prune_jobs() -> None:
+    now = time.time()
+    with _lock:
+        expired = [
+            job_id for job_id, job in _jobs.items()
+            if job["finished_at"] and now - job["finished_at"] > JOB_TTL_SECONDS
+        ]
+        for job_id in expired:
+            del _jobs[job_id]
+        # A batch goes once none of its jobs are left (its jobs are
+        # submitted right after it is created, so give them time)
+        for batch_id in [
+            batch_id for batch_id, batch in _batches.items()
+            if now - batch["created_at"] > JOB_TTL_SECONDS
+            and not any(session["job_id"] in _jobs for session in batch["sessions"])
+        ]:
+            del _batches[batch_id]
+
+
+def emit_event(event: dict, job_id: str | None = None) -> None:
+    """
+    Append a progress event to a job (by default the current one). Events
+    are kept with the job so late subscribers can replay them.
+    """
+    job_id = job_id or current_job_id.get()
+    if job_id is None:
+        return
+    with _lock:
+        job = _jobs.get(job_id)
+        if job is None:
+            return
+        job["events"].append({"id": len(job["events"]), "time": time.time(), **event})
+
+
+def get_events(job_id: str, start: int = 0) -> list[dict] | None:
+    """
+    Events of a job from index start on, or None for an unknown job.
+    """
+    with _lock:
+        job = _jobs.get(job_id)
+        return job["events"][start:] if job else None
+
+
+def _run_in_job_context(job_id: str, fn, args, kwargs):
+    current_job_id.set(job_id)
+    return fn(*args, **kwargs)
+
+
+def _run_job(job_id: str, fn, args, kwargs) -> None:
+    with _lock:
+        job = _jobs[job_id]
+        job["status"] = "running"
+        job["started_at"] = time.time()
+    emit_event({"type": "job_started"}, job_id)
+
+    try:
+        # Fresh context per job so nothing set by one job (e.g. its
+        # workspace) leaks into the next job run on the same thread
+        result = contextvars.Context().run(_run_in_job_context, job_id, fn, args, kwargs)
+    except Exception as e:
+        traceback.print_exc()
+        with _lock:
+            job["status"] = "failed"
+            job["error"] = str(e)
+            job["finished_at"] = time.time()
+        emit_event({"type": "job_finished", "status": "failed", "error": str(e)}, job_id)
+        return
+
+    with _lock:
+        job["status"] = "done"
+        job["result"] = result
+        job["finished_at"] = time.time()
+    emit_event({"type": "job_finished", "status": "done"}, job_id)
+
+
+def new_job_id() -> str:
+    return uuid.uuid4().hex
+
+
+def submit_job(fn, *args, job_id: str | None = None, batch_id: str | None = None, **kwargs) -> str:
+    """
+    Queue fn(*args, **kwargs) on the worker pool (the batch pool for a job
+    of a batch) and return the job id (a new one unless job_id is given).
+    """
+    _prune_jobs()
+
+    job_id = job_id or new_job_id()
+    with _lock:
+        _jobs[job_id] = {
+            "id": job_id,
+            "status": "queued",
+            "created_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+            "result": None,
+            "error": None,
+            "events": [],
+            "batch_id": batch_id,
+        }
+    executor = _batch_executor if batch_id else _executor
+    executor.submit(_run_job, job_id, fn, args, kwargs)
+    return job_id
+
+
+def get_job(job_id: str) -> dict | None:
+    with _lock:
+        job = _jobs.get(job_id)
+        return dict(job) if job else None
+
+
+def job_status(job: dict) -> dict:
+    """
+    Public view of a job, without the (potentially large) result payload
+    and event log.
+    """
+    return {k: v for k, v in job.items() if k not in ("result", "events")}
+
+
+def job_counts() -> dict[str, int]:
+    """
+    Number of known jobs in each status.
+    """
+    with _lock:
+        counts = {status: 0 for status in ("queued", "running", "done", "failed")}
+        for job in _jobs.values():
+            counts[job["status"]] = counts.get(job["status"], 0) + 1
+    return counts
+
+
+def create_batch(batch_id: str, sessions: list[dict]) -> None:
+    """
+    Record a batch: sessions is a list of {"name", "job_id"} for jobs
+    submitted with this batch_id.
+    """
+    with _lock:
+        _batches[batch_id] = {"id": batch_id, "created_at": time.time(), "sessions": sessions}
+
+
+def batch_progress(batch_id: str) -> dict | None:
+    """
+    Aggregate progress of a batch and the status of each of its jobs, or
+    None for an unknown batch.
+    """
+    with _lock:
+        batch = _batches.get(batch_id)
+        if batch is None:
+            return None
+        sessions = []
+        for session in batch["sessions"]:
+            job = _jobs.get(session["job_id"], {})
+            sessions.append({
+                **session,
+                "status": job.get("status", "expired"),
+                "error": job.get("error"),
+                "started_at": job.get("started_at"),
+                "finished_at": job.get("finished_at"),
+            })
+
+    counts = {status: 0 for status in ("queued", "running", "done", "failed", "expired")}
+    for session in sessions:
+        counts[session["status"]] += 1
+    finished = counts["done"] + counts["failed"] + counts["expired"]
+    finish_times = [s["finished_at"] for s in sessions if s["finished_at"]]
+    return {
+        "id": batch_id,
+        "created_at": batch["created_at"],
+        "total": len(sessions),
+        "counts": counts,
+        "progress": finished / len(sessions) if sessions else 1.0,
+        "finished_at": max(finish_times) if finished == len(sessions) and finish_times else None,
+        "sessions": sessions,
+    }
@@ -1,16 +1,72 @@
-from fastapi import FastAPI, UploadFile, File
+from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
 
-from agent import create_code
+from agent import create_code, creator_cache, enrich_cache, get_agents, ocr_cache, transcript_cache
+from batches import prepare_batch
+from clients import pool_stats, warm_clients
+from jobs import (
+    batch_progress, create_batch, get_events, get_job, job_counts, job_status, new_job_id, submit_job,
+)
+from manifest import load_manifest, save_manifest, scan_project, write_archive
+from metrics import pop_job_metrics, render_prometheus
+from projects import is_valid_project_id, reap_projects
+from store import get_competition_analyses
+from uploads import MAX_ARCHIVE_BYTES, MAX_IMAGES, MAX_REQUEST_BYTES, save_upload
+from upstream import upstream_stats
+from web import cache_stats as web_cache_stats
+from workspace import create_workspace, release_workspace, start_reaper, workspace_path
 
 import os
-import io
+import asyncio
+import threading
 import json
-import zipfile
-import base64
+import re
+import shutil
+from urllib.parse import quote
+
+# Project archive written once per job, next to its generated project
+ARCHIVE_NAME = "project.zip"
+# File list of the archive (paths, sizes, SHA-256), written with it
+MANIFEST_NAME = "manifest.json"
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+# How often the progress stream checks a job for new events
+EVENT_POLL_SECONDS = 0.5
 
 app = FastAPI()
 
+
+# Whole request size allowed per upload endpoint
+UPLOAD_REQUEST_LIMITS = {
+    "/process": MAX_REQUEST_BYTES,
+    "/batches": MAX_ARCHIVE_BYTES + (1 << 20),
+}
+
+
+@app.middleware("http")
+async def limit_upload_size(request: Request, call_next):
+    """
+    Reject oversized uploads from their Content-Length, before the
+    multipart body is read. Requests without one (chunked) are refused:
+    Starlette would spool their whole body before save_upload could check
+    it. Registered before CORS, so CORS wraps it and the browser can read
+    the error.
+    """
+    limit = UPLOAD_REQUEST_LIMITS.get(request.url.path)
+    if limit is not None and request.method == "POST":
+        header = request.headers.get("content-length")
+        if header is None:
+            return JSONResponse(status_code=411, content={"detail": "Content-Length is required for uploads."})
+        try:
+            length = int(header)
+        except ValueError:
+            return JSONResponse(status_code=400, content={"detail": "Invalid Content-Length."})
+        if length > limit:
+            return JSONResponse(status_code=413, content={"detail": "Upload too large."})
+    return await call_next(request)
+
+
 # Allow your Next.js dev server to talk to the backend
 app.add_middleware(
     CORSMiddleware,
@@ -21,86 +77,95 @@ app.add_middleware(
 )
 
 
-def zip_directory_to_bytes(dir_path: str) -> bytes:
-  """
-  Walk a directory and return a ZIP archive as bytes.
-  """
-  buf = io.BytesIO()
-  with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as zf:
-      for root, dirs, files in os.walk(dir_path):
-          for filename in files:
-              full_path = os.path.join(root, filename)
-              rel_path = os.path.relpath(full_path, dir_path)
-              zf.write(full_path, arcname=rel_path)
-  buf.seek(0)
-  return buf.getvalue()
-
-
-def build_code_tree(root_dir: str) -> str:
-  """
-  Produce a simple textual tree of the project:
-  MyApp/
-    frontend/
-      index.html
-    backend/
-      main.py
-  """
-  lines = []
-  root_name = os.path.basename(os.path.abspath(root_dir))
-  lines.append(f"{root_name}/")
+@app.on_event("startup")
+def warm_up_agents():
+    # Build and load the WayFlow agents once, before the first job needs them
+    get_agents()
 
-  for current_root, dirs, files in os.walk(root_dir):
-      rel = os.path.relpath(current_root, root_dir)
-      if rel == ".":
-          indent_level = 0
-      else:
-          indent_level = rel.count(os.sep) + 1
 
-      if rel != ".":
-          indent = "  " * indent_level
-          lines.append(f"{indent}{os.path.basename(current_root)}/")
+@app.on_event("startup")
+def start_workspace_reaper():
+    # Saved projects are reaped along with the job workspaces
+    start_reaper(reap_projects)
 
-      sub_indent = "  " * (indent_level + 1)
-      for f in files:
-          lines.append(f"{sub_indent}{f}")
 
-  return "\n".join(lines)
+@app.on_event("startup")
+def warm_up_clients():
+    # Connecting to the Spaces can take a while; don't hold up startup for it
+    threading.Thread(target=warm_clients, name="specter-warmup", daemon=True).start()
 
 
-def analyze_structure_json(structure_json_str: str, project_root: str) -> str:
+def parse_range(range_header: str, size: int) -> tuple[int, int]:
   """
-  Human-readable analysis of the project organization based on the JSON
-  the creator agent returned.
+  Parse a single "bytes=start-end" Range header into an inclusive
+  (start, end) pair. Raises ValueError if it can't be satisfied.
   """
-  try:
-      data = json.loads(structure_json_str)
-  except Exception as e:
-      return f"Could not parse project structure JSON: {e}"
+  match = re.fullmatch(r"bytes=(\d*)-(\d*)", range_header.strip())
+  if not match or match.groups() == ("", ""):
+      raise ValueError(f"Unsupported range: {range_header}")
 
-  lines = [f"Project root: {project_root}", "", "Folders:"]
+  first, last = match.groups()
+  if first == "":
+      # Suffix range: the last N bytes
+      start, end = max(size - int(last), 0), size - 1
+  else:
+      start = int(first)
+      end = min(int(last), size - 1) if last else size - 1
+
+  if start > end or start >= size:
+      raise ValueError(f"Unsatisfiable range: {range_header}")
+  return start, end
+
+
+def content_disposition(filename: str) -> str:
+  """
+  Attachment header for a file named by the LLM: a plain ASCII filename
+  for every client, plus the exact UTF-8 name (RFC 5987) when it differs.
+  """
+  stem, extension = os.path.splitext(filename)
+  ascii_stem = re.sub(r"[^A-Za-z0-9._-]+", "_", stem).strip("._") or "project"
+  header = f'attachment; filename="{ascii_stem}{extension}"'
+  quoted = quote(filename)
+  if quoted != filename:
+      header += f"; filename*=utf-8''{quoted}"
+  return header
+
+
+def iter_file(path: str, start: int, end: int):
+  with open(path, "rb") as f:
+      f.seek(start)
+      remaining = end - start + 1
+      while remaining > 0:
+          chunk = f.read(min(DOWNLOAD_CHUNK_SIZE, remaining))
+          if not chunk:
+              break
+          remaining -= len(chunk)
+          yield chunk
 
-  for folder_name, folder_content in data.items():
-      if not isinstance(folder_content, dict):
-          continue
 
-      # Count files in this logical folder
-      file_paths = [
-          k for k, v in folder_content.items()
-          if k != "functions" and isinstance(v, str)
-      ]
-      lines.append(f"- {folder_name}: {len(file_paths)} files")
+def analyze_structure(structure: dict, project_root: str, stats: dict | None = None) -> str:
+  """
+  Human-readable analysis of the project organization based on the
+  structure the creator agent returned (already parsed by create_code),
+  plus the size of what was actually generated when stats is given.
+  """
+  lines = [f"Project root: {project_root}", "", "Folders:"]
 
-  # Rough language / file-type stats
+  # Files per logical folder and rough language / file-type stats, in one pass
   ext_counts: dict[str, int] = {}
-  for folder_content in data.values():
+  for folder_name, folder_content in structure.items():
       if not isinstance(folder_content, dict):
           continue
+
+      file_count = 0
       for path, desc in folder_content.items():
           if path == "functions" or not isinstance(desc, str):
               continue
+          file_count += 1
           _, ext = os.path.splitext(path)
           if ext:
               ext_counts[ext] = ext_counts.get(ext, 0) + 1
+      lines.append(f"- {folder_name}: {file_count} files")
 
   if ext_counts:
       lines.append("")
@@ -108,73 +173,437 @@ def analyze_structure_json(structure_json_str: str, project_root: str) -> str:
       for ext, count in ext_counts.items():
           lines.append(f"- {ext}: {count} files")
 
+  if stats:
+      lines.append("")
+      lines.append(f"Generated: {stats['files']} files in {stats['dirs']} folders, {stats['bytes']} bytes")
+
   return "\n".join(lines)
 
 
-@app.post("/process")
-async def process_project(
-    image: UploadFile | None = File(None),
-    audio: UploadFile | None = File(None),
-):
+def run_pipeline(
+    job_id: str,
+    image_paths: list[str],
+    audio_path: str | None,
+    project_id: str,
+    use_llm_cache: bool = True,
+) -> dict:
     """
-    image: whiteboard photo (from upload or webcam)
-    audio: brainstorming audio (uploaded or recorded)
+    Worker-side part of /process: run the agents, then package the
+    generated project for the frontend. Everything is read from and
+    written to the job's workspace.
     """
+    workspace = workspace_path(job_id)
+    try:
+        return _run_pipeline(job_id, workspace, image_paths, audio_path, project_id, use_llm_cache)
+    finally:
+        release_workspace(workspace)
+        # Normally attached to the result already; drop what a failed job left
+        pop_job_metrics(job_id)
 
-    overview = ""
-    structure_json_str = ""
-    project_root = ""
-    
-    have_audio = audio is not None
-    have_image = image is not None
-
-    if image is not None:
-        image_bytes = await image.read()
-
-        # Save image to disk (for your OCR/model)
-        with open("input_image.jpg", "wb") as f:
-            f.write(image_bytes)
-
-    if audio is not None:
-        audio_bytes = await audio.read()
-        
-        with open("input_audio.wav", "wb") as f:
-            f.write(audio_bytes)
-        
-            
+
+def _run_pipeline(
+    job_id: str,
+    workspace: str,
+    image_paths: list[str],
+    audio_path: str | None,
+    project_id: str,
+    use_llm_cache: bool,
+) -> dict:
     # Run your agent pipeline: returns spec, structure JSON, and project root folder
-    spec, structure_json_str, project_root, competition_output = create_code(
-        image_path="input_image.jpg" if have_image else None,
-        audio_url="input_audio.wav" if have_audio else None,
+    spec, structure_json_str, structure, project_root, competition_output, run_info = create_code(
+        image_path=image_paths,
+        audio_url=audio_path,
+        workspace=workspace,
+        project_id=project_id,
+        use_llm_cache=use_llm_cache,
     )
 
     # If for some reason project_root is empty (e.g., no image), avoid crashes
     if not project_root:
         project_root = "GeneratedProject"  # or None; up to you
+    project_dir = os.path.join(workspace, project_root)
 
-    # Build textual code tree (to show in your "Code" tab)
-    if os.path.exists(project_root):
-        code_tree = build_code_tree(project_root)
-        # Zip the folder
-        zip_bytes = zip_directory_to_bytes(project_root)
-        zip_base64 = base64.b64encode(zip_bytes).decode("utf-8")
+    # One walk of the project gives the code tree (for the "Code" tab), the
+    # stats and the file list the archive is written from
+    stats = None
+    if os.path.exists(project_dir):
+        manifest = scan_project(project_dir)
+        code_tree = manifest["tree"]
+        stats = manifest["stats"]
+        # Zip the folder once; /jobs/{job_id}/download streams it from disk
+        archive_etag = write_archive(manifest, project_dir, os.path.join(workspace, ARCHIVE_NAME))
+        save_manifest(manifest, os.path.join(workspace, MANIFEST_NAME))
+        download_url = f"/jobs/{job_id}/download"
     else:
         code_tree = "Project folder not found on server."
-        zip_base64 = ""
+        archive_etag = ""
+        download_url = ""
 
     # Analyze the project structure into a human-readable summary
-    if structure_json_str:
-        architecture_analysis = analyze_structure_json(structure_json_str, project_root)
+    if structure is not None:
+        architecture_analysis = analyze_structure(structure, project_root, stats)
     else:
         architecture_analysis = "No project structure JSON available."
 
-
     return {
         "overview": spec,
         "architecture": architecture_analysis,
         "code": code_tree,
-        "zip_base64": zip_base64,
+        "download_url": download_url,
+        "archive_etag": archive_etag,
         "project_root": project_root,
+        "project_id": project_id,
         "structure_json": structure_json_str,
+        "project_stats": stats,
         "competition_analysis": competition_output,
+        "run_info": run_info,
+    }
+
+
+@app.post("/process")
+async def process_project(
+    image: UploadFile | None = File(None),
+    images: list[UploadFile] | None = File(None),
+    audio: UploadFile | None = File(None),
+    project_id: str | None = Form(None),
+    no_cache: bool = Form(False),
+):
+    """
+    image: whiteboard photo (from upload or webcam)
+    images: several photos of one session (whiteboards, sticky-note walls),
+    OCR'd concurrently and merged in order; may be combined with image
+    audio: brainstorming audio (uploaded or recorded)
+    project_id: id returned by an earlier run of the same project; only the
+    files whose part of the structure changed are regenerated
+    no_cache: recompute the enricher and creator outputs even if they are
+    cached (see SPECTER_LLM_CACHE)
+
+    The pipeline takes minutes, so it runs on the job worker pool and this
+    returns a job id right away. Poll /jobs/{job_id} and fetch
+    /jobs/{job_id}/result once it is done.
+    """
+
+    if project_id is not None and not is_valid_project_id(project_id):
+        raise HTTPException(status_code=400, detail="Invalid project id.")
+
+    image_uploads = ([image] if image is not None else []) + list(images or [])
+    if len(image_uploads) > MAX_IMAGES:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_IMAGES} images per job.")
+
+    # Each job works in its own directory so concurrent runs never share
+    # inputs or generated files
+    job_id = new_job_id()
+    workspace = create_workspace(job_id)
+    if len(image_uploads) == 1:
+        image_paths = [os.path.join(workspace, "input_image.jpg")]
+    else:
+        image_paths = [os.path.join(workspace, f"input_image_{i:02d}.jpg") for i in range(len(image_uploads))]
+    audio_path = os.path.join(workspace, "input_audio.wav")
+
+    have_audio = audio is not None
+
+    # Streamed to disk in chunks, checked and hashed on the way
+    try:
+        for upload, path in zip(image_uploads, image_paths):
+            await save_upload(upload, "image", path)
+        if audio is not None:
+            await save_upload(audio, "audio", audio_path)
+    except HTTPException:
+        release_workspace(workspace)
+        shutil.rmtree(workspace, ignore_errors=True)
+        raise
+
+    submit_job(
+        run_pipeline,
+        job_id,
+        image_paths=image_paths,
+        audio_path=audio_path if have_audio else None,
+        project_id=project_id or job_id,
+        use_llm_cache=not no_cache,
+        job_id=job_id,
+    )
+
+    return {"job_id": job_id, "status": "queued"}
+
+
+@app.post("/batches")
+async def submit_batch(
+    archive: UploadFile = File(...),
+    no_cache: bool = Form(False),
+):
+    """
+    archive: ZIP of brainstorm sessions. Either one folder per session
+    (its photos and recording), files at the root paired by name
+    ("board1.jpg" + "board1.wav"), or a manifest.json listing
+    {"name", "images", "audio", "project_id"} per session.
+    no_cache: as for /process
+
+    Every session becomes a job. They run together, each shared upstream
+    (LLM, every Space, Tavily) limited to its own concurrency, so the
+    batch moves at the pace of its busiest resource. Follow it on
+    /batches/{batch_id} and collect /batches/{batch_id}/results.
+    """
+    batch_id = new_job_id()
+    staging = create_workspace(f"batch-{batch_id}")
+    try:
+        zip_path = os.path.join(staging, "sessions.zip")
+        await save_upload(archive, "archive", zip_path)
+        try:
+            sessions = await asyncio.to_thread(prepare_batch, zip_path)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    finally:
+        # The inputs are now in the job workspaces
+        release_workspace(staging)
+        shutil.rmtree(staging, ignore_errors=True)
+
+    create_batch(batch_id, [{"name": session["name"], "job_id": session["job_id"]} for session in sessions])
+    for session in sessions:
+        submit_job(
+            run_pipeline,
+            session["job_id"],
+            image_paths=session["image_paths"],
+            audio_path=session["audio_path"],
+            project_id=session["project_id"] or session["job_id"],
+            use_llm_cache=not no_cache,
+            job_id=session["job_id"],
+            batch_id=batch_id,
+        )
+
+    return {
+        "batch_id": batch_id,
+        "total": len(sessions),
+        "sessions": [{"name": session["name"], "job_id": session["job_id"]} for session in sessions],
     }
+
+
+@app.get("/batches/{batch_id}")
+async def get_batch_status(batch_id: str):
+    """
+    Aggregate progress of a batch, the status of each session and how
+    busy each shared upstream is.
+    """
+    progress = batch_progress(batch_id)
+    if progress is None:
+        raise HTTPException(status_code=404, detail="Unknown batch id.")
+    upstreams, pools = upstream_stats(), pool_stats()
+    # The Spaces' concurrency is their client pool
+    stats = {name: {**upstreams.get(name, {}), **pools.get(name, {})} for name in {**upstreams, **pools}}
+    return {**progress, "upstreams": stats}
+
+
+@app.get("/batches/{batch_id}/results")
+async def get_batch_results(batch_id: str):
+    """
+    One index of the batch's results: per session its status and where to
+    get the spec, analysis and project archive.
+    """
+    progress = batch_progress(batch_id)
+    if progress is None:
+        raise HTTPException(status_code=404, detail="Unknown batch id.")
+
+    index = []
+    for session in progress["sessions"]:
+        job = get_job(session["job_id"])
+        entry = {
+            "name": session["name"],
+            "job_id": session["job_id"],
+            "status": session["status"],
+            "error": session["error"],
+        }
+        if job is not None and job["status"] == "done":
+            result = job["result"]
+            entry.update({
+                "project_id": result["project_id"],
+                "project_root": result["project_root"],
+                "overview": result["overview"][:500],
+                "result_url": f"/jobs/{session['job_id']}/result",
+                "download_url": result["download_url"],
+                "archive_etag": result["archive_etag"],
+                "stage_timings": result["run_info"]["stage_timings"],
+            })
+        index.append(entry)
+
+    return {
+        "batch_id": batch_id,
+        "progress": progress["progress"],
+        "counts": progress["counts"],
+        "sessions": index,
+    }
+
+
+@app.get("/cache/stats")
+async def get_cache_stats():
+    """
+    Hit/miss counters of the result caches since the server started.
+    """
+    return {
+        "ocr": ocr_cache.stats(),
+        "transcripts": transcript_cache.stats(),
+        "enrich": enrich_cache.stats(),
+        "creator": creator_cache.stats(),
+        **web_cache_stats(),
+    }
+
+
+@app.get("/metrics")
+async def get_metrics():
+    """
+    Stage, agent, tool and upstream timings, bytes, LLM tokens and
+    upstream retries / failures, plus cache, job and circuit breaker
+    gauges, in the Prometheus text format.
+    """
+    caches = {
+        "ocr": ocr_cache.stats(),
+        "transcripts": transcript_cache.stats(),
+        "enrich": enrich_cache.stats(),
+        "creator": creator_cache.stats(),
+        **web_cache_stats(),
+    }
+    upstreams = upstream_stats()
+    gauges = {
+        "specter_cache_hits": [({"cache": name}, stats["hits"]) for name, stats in caches.items()],
+        "specter_cache_misses": [({"cache": name}, stats["misses"]) for name, stats in caches.items()],
+        "specter_jobs": [({"status": status}, count) for status, count in job_counts().items()],
+        # 0 closed, 1 half open, 2 open
+        "specter_upstream_circuit_state": [
+            ({"service": name}, {"closed": 0, "half_open": 1, "open": 2}[stats["circuit"]])
+            for name, stats in upstreams.items()
+        ],
+        "specter_upstream_rate": [({"service": name}, stats["rate"]) for name, stats in upstreams.items()],
+    }
+    return PlainTextResponse(render_prometheus(gauges), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/jobs/{job_id}")
+async def get_job_status(job_id: str):
+    job = get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown job id.")
+    return job_status(job)
+
+
+@app.get("/jobs/{job_id}/events")
+async def stream_job_events(job_id: str, request: Request):
+    """
+    Server-Sent Events stream of a job's progress: stage start/finish
+    events with timings and partial results (OCR text, transcript, spec,
+    competition analysis, structure), every written file, and a final
+    job_finished event. Past events are replayed first, so it can be
+    opened at any time; reconnects resume from Last-Event-ID.
+    """
+    if get_job(job_id) is None:
+        raise HTTPException(status_code=404, detail="Unknown job id.")
+
+    last_event_id = request.headers.get("last-event-id")
+    start = int(last_event_id) + 1 if last_event_id and last_event_id.isdigit() else 0
+
+    async def event_stream():
+        next_index = start
+        while True:
+            events = get_events(job_id, next_index)
+            if events is None:
+                return
+            for event in events:
+                yield f"id: {event['id']}\nevent: {event['type']}\ndata: {json.dumps(event, default=str)}\n\n"
+                if event["type"] == "job_finished":
+                    return
+            next_index += len(events)
+
+            if await request.is_disconnected():
+                return
+            await asyncio.sleep(EVENT_POLL_SECONDS)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.get("/jobs/{job_id}/result")
+async def get_job_result(job_id: str):
+    job = get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown job id.")
+    if job["status"] == "failed":
+        raise HTTPException(status_code=500, detail=job["error"])
+    if job["status"] != "done":
+        raise HTTPException(status_code=409, detail=f"Job is {job['status']}.")
+    return job["result"]
+
+
+@app.get("/jobs/{job_id}/competition")
+async def get_job_competition(job_id: str):
+    """
+    Competition analyses stored for a job. They outlive the in-memory job
+    record, so this also works for old jobs.
+    """
+    analyses = get_competition_analyses(job_id)
+    if not analyses:
+        raise HTTPException(status_code=404, detail="No competition analysis for this job.")
+    return {"job_id": job_id, "analyses": analyses}
+
+
+@app.get("/jobs/{job_id}/download")
+async def download_project(job_id: str, request: Request):
+    """
+    Stream the job's project archive. Supports conditional requests
+    (If-None-Match) and single byte ranges for resumed downloads.
+    """
+    job = get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown job id.")
+    if job["status"] != "done" or not job["result"]["download_url"]:
+        raise HTTPException(status_code=404, detail="No project archive for this job.")
+
+    zip_path = os.path.join(workspace_path(job_id), ARCHIVE_NAME)
+    if not os.path.exists(zip_path):
+        raise HTTPException(status_code=410, detail="Project archive has expired.")
+
+    etag = f'"{job["result"]["archive_etag"]}"'
+    size = os.path.getsize(zip_path)
+    headers = {
+        "ETag": etag,
+        "Accept-Ranges": "bytes",
+        "Content-Disposition": content_disposition(f'{job["result"]["project_root"]}.zip'),
+    }
+
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+
+    start, end, status_code = 0, size - 1, 200
+    range_header = request.headers.get("range")
+    if range_header and size:
+        try:
+            start, end = parse_range(range_header, size)
+        except ValueError:
+            return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+        status_code = 206
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+
+    headers["Content-Length"] = str(end - start + 1 if size else 0)
+    return StreamingResponse(
+        iter_file(zip_path, start, end),
+        status_code=status_code,
+        media_type="application/zip",
+        headers=headers,
+    )
+
+
+@app.get("/jobs/{job_id}/manifest")
+async def get_project_manifest(job_id: str):
+    """
+    Files of the job's project archive with their sizes and SHA-256, plus
+    the code tree and stats, without downloading the archive.
+    """
+    job = get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown job id.")
+    if job["status"] != "done" or not job["result"]["download_url"]:
+        raise HTTPException(status_code=404, detail="No project archive for this job.")
+
+    manifest = load_manifest(os.path.join(workspace_path(job_id), MANIFEST_NAME))
+    if manifest is None:
+        raise HTTPException(status_code=410, detail="Project archive has expired.")
+    return manifest
@@ -0,0 +1,128 @@
+import hashlib
+import json
+import os
+import zipfile
+
+# Read size when copying files into the archive
+CHUNK_SIZE = 64 * 1024
+
+
+def scan_project(root_dir: str) -> dict:
+    """
+    Walk a generated project once and describe it: every file with its
+    size and extension, the textual tree shown in the Code tab and
+    per-extension stats. The archiver works from this manifest instead of
+    walking the project again. Symlinks are skipped.
+
+    Tree format:
+    MyApp/
+      frontend/
+        index.html
+      backend/
+        main.py
+    """
+    root_name = os.path.basename(os.path.abspath(root_dir))
+    files = []
+    tree = [f"{root_name}/"]
+    extensions: dict[str, dict] = {}
+    total_bytes = 0
+    dir_count = 0
+
+    # Depth-first, each folder's files before its subfolders
+    stack = [(root_dir, "", 0)]
+    while stack:
+        current, rel_dir, depth = stack.pop()
+        if rel_dir:
+            tree.append(f"{'  ' * depth}{os.path.basename(current)}/")
+
+        with os.scandir(current) as it:
+            entries = sorted(it, key=lambda entry: entry.name)
+
+        subdirs = []
+        for entry in entries:
+            if entry.is_symlink():
+                continue
+            rel_path = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+            if entry.is_dir():
+                subdirs.append((entry.path, rel_path, depth + 1))
+                continue
+
+            size = entry.stat().st_size
+            ext = os.path.splitext(entry.name)[1]
+            files.append({"path": rel_path, "size": size, "ext": ext})
+            tree.append(f"{'  ' * (depth + 1)}{entry.name}")
+            total_bytes += size
+            if ext:
+                ext_stats = extensions.setdefault(ext, {"files": 0, "bytes": 0})
+                ext_stats["files"] += 1
+                ext_stats["bytes"] += size
+
+        dir_count += len(subdirs)
+        stack.extend(reversed(subdirs))
+
+    return {
+        "root": root_name,
+        "files": files,
+        "tree": "\n".join(tree),
+        "stats": {
+            "files": len(files),
+            "dirs": dir_count,
+            "bytes": total_bytes,
+            "extensions": extensions,
+        },
+    }
+
+
+class _HashingWriter:
+    """
+    Write-only file wrapper hashing everything written through it. It has
+    no seek/tell, so zipfile streams entries with data descriptors and the
+    archive is written and hashed in a single pass.
+    """
+
+    def __init__(self, f):
+        self._f = f
+        self.digest = hashlib.sha256()
+
+    def write(self, data) -> int:
+        self.digest.update(data)
+        return self._f.write(data)
+
+    def flush(self) -> None:
+        self._f.flush()
+
+
+def write_archive(manifest: dict, root_dir: str, zip_path: str) -> str:
+    """
+    Write the files of a manifest to a ZIP archive, chunk by chunk, adding
+    each file's SHA-256 to its manifest entry. Returns the SHA-256 of the
+    archive, used as its ETag.
+    """
+    with open(zip_path, "wb") as raw:
+        out = _HashingWriter(raw)
+        with zipfile.ZipFile(out, "w", zipfile.ZIP_DEFLATED) as zf:
+            for entry in manifest["files"]:
+                full_path = os.path.join(root_dir, entry["path"])
+                info = zipfile.ZipInfo.from_file(full_path, arcname=entry["path"])
+                info.compress_type = zipfile.ZIP_DEFLATED
+
+                digest = hashlib.sha256()
+                with open(full_path, "rb") as src, zf.open(info, "w") as dst:
+                    for chunk in iter(lambda: src.read(CHUNK_SIZE), b""):
+                        digest.update(chunk)
+                        dst.write(chunk)
+                entry["sha256"] = digest.hexdigest()
+    return out.digest.hexdigest()
+
+
+def save_manifest(manifest: dict, path: str) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False)
+
+
+def load_manifest(path: str) -> dict | None:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
@@ -0,0 +1,171 @@
+import functools
+import threading
+import time
+from contextlib import contextmanager
+
+from jobs import current_job_id
+
+# Process-wide aggregates, exposed on /metrics
+_lock = threading.Lock()
+# (kind, name) -> {"count", "errors", "seconds", "max_seconds"}
+_spans: dict[tuple[str, str], dict] = {}
+# (metric, labels) -> value
+_counters: dict[tuple[str, tuple], float] = {}
+# job id -> metrics of that job only, attached to its result
+_job_metrics: dict[str, dict] = {}
+
+
+def _job_bucket() -> dict | None:
+    job_id = current_job_id.get()
+    if job_id is None:
+        return None
+    return _job_metrics.setdefault(job_id, {
+        "spans": [],
+        "tool_calls": {},
+        "bytes": {},
+        "llm_tokens": {},
+        "upstream_events": {},
+    })
+
+
+def _add(metric: str, labels: dict, value: float) -> None:
+    key = (metric, tuple(sorted(labels.items())))
+    _counters[key] = _counters.get(key, 0) + value
+
+
+def record_span(kind: str, name: str, seconds: float, error: str | None = None) -> None:
+    with _lock:
+        stats = _spans.setdefault((kind, name), {"count": 0, "errors": 0, "seconds": 0.0, "max_seconds": 0.0})
+        stats["count"] += 1
+        stats["errors"] += error is not None
+        stats["seconds"] += seconds
+        stats["max_seconds"] = max(stats["max_seconds"], seconds)
+
+        job = _job_bucket()
+        if job is not None:
+            job["spans"].append({"kind": kind, "name": name, "seconds": round(seconds, 4), "error": error})
+            if kind == "tool":
+                job["tool_calls"][name] = job["tool_calls"].get(name, 0) + 1
+
+
+@contextmanager
+def span(kind: str, name: str):
+    """
+    Time a block (an agent conversation, a tool call, an upstream request)
+    into both the process-wide and the current job's metrics.
+    """
+    start = time.perf_counter()
+    error = None
+    try:
+        yield
+    except Exception as e:
+        error = str(e)
+        raise
+    finally:
+        record_span(kind, name, time.perf_counter() - start, error)
+
+
+def record_bytes(service: str, direction: str, count: int) -> None:
+    """
+    Count bytes sent ("out") to or received ("in") from a service.
+    """
+    with _lock:
+        _add("specter_bytes_total", {"service": service, "direction": direction}, count)
+        job = _job_bucket()
+        if job is not None:
+            key = f"{service}_{direction}"
+            job["bytes"][key] = job["bytes"].get(key, 0) + count
+
+
+def record_tokens(agent: str, input_tokens: int, output_tokens: int) -> None:
+    with _lock:
+        _add("specter_llm_tokens_total", {"agent": agent, "type": "input"}, input_tokens)
+        _add("specter_llm_tokens_total", {"agent": agent, "type": "output"}, output_tokens)
+        job = _job_bucket()
+        if job is not None:
+            tokens = job["llm_tokens"].setdefault(agent, {"input": 0, "output": 0})
+            tokens["input"] += input_tokens
+            tokens["output"] += output_tokens
+
+
+def record_upstream_event(service: str, event: str) -> None:
+    """
+    Count a retry, timeout, failure, rejected call or opened circuit of an
+    upstream service.
+    """
+    with _lock:
+        _add("specter_upstream_events_total", {"service": service, "event": event}, 1)
+        job = _job_bucket()
+        if job is not None:
+            key = f"{service}_{event}"
+            job["upstream_events"][key] = job["upstream_events"].get(key, 0) + 1
+
+
+def instrument_tool(name: str, fn):
+    """
+    Wrap a tool function so every call is timed and counted, with the size
+    of its arguments and result as bytes exchanged with the agent.
+    """
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        with span("tool", name):
+            result = fn(*args, **kwargs)
+        sent = sum(len(str(value).encode("utf-8")) for value in (*args, *kwargs.values()))
+        record_bytes(f"tool:{name}", "in", sent)
+        if result is not None:
+            record_bytes(f"tool:{name}", "out", len(str(result).encode("utf-8")))
+        return result
+
+    return wrapper
+
+
+def pop_job_metrics(job_id: str) -> dict | None:
+    with _lock:
+        return _job_metrics.pop(job_id, None)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels) + "}"
+
+
+def render_prometheus(gauges: dict[str, list[tuple[dict, float]]] | None = None) -> str:
+    """
+    All metrics in the Prometheus text exposition format. gauges holds
+    extra point-in-time values: metric name -> [(labels, value), ...].
+    """
+    lines = []
+    with _lock:
+        spans = dict(_spans)
+        counters = dict(_counters)
+
+    for metric, field, help_text, metric_type in (
+        ("specter_span_seconds_total", "seconds", "Total time spent in each span.", "counter"),
+        ("specter_spans_total", "count", "Number of completed spans.", "counter"),
+        ("specter_span_seconds_max", "max_seconds", "Longest single span.", "gauge"),
+        ("specter_span_errors_total", "errors", "Spans that raised.", "counter"),
+    ):
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} {metric_type}")
+        for (kind, name), stats in sorted(spans.items()):
+            lines.append(f"{metric}{_format_labels((('kind', kind), ('name', name)))} {stats[field]}")
+
+    by_metric: dict[str, list] = {}
+    for (metric, labels), value in counters.items():
+        by_metric.setdefault(metric, []).append((labels, value))
+    for metric, values in sorted(by_metric.items()):
+        lines.append(f"# TYPE {metric} counter")
+        for labels, value in sorted(values):
+            lines.append(f"{metric}{_format_labels(labels)} {value}")
+
+    for metric, values in sorted((gauges or {}).items()):
+        lines.append(f"# TYPE {metric} gauge")
+        for labels, value in values:
+            lines.append(f"{metric}{_format_labels(tuple(sorted(labels.items())))} {value}")
+
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,84 @@
+import contextvars
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Callable
+
+# A stage is (dependencies, fn). fn receives {dep_name: dep_result} and
+# returns the stage result. A failed dependency shows up as None, so each
+# stage decides for itself whether it can still do something useful.
+Stage = tuple[list[str], Callable[[dict], object]]
+
+
+def run_stages(
+    stages: dict[str, Stage],
+    max_workers: int | None = None,
+    on_event: Callable[[dict], None] | None = None,
+) -> tuple[dict, dict, dict]:
+    """
+    Run a small dependency graph of stages, starting every stage as soon as
+    all of its dependencies have finished. Independent branches run in
+    parallel threads, so total time is the critical path, not the sum.
+
+    Returns (results, errors, timings): results and errors are keyed by
+    stage name, timings hold the wall-clock seconds spent in each stage.
+    A stage raising does not stop the others.
+
+    on_event, if given, is called with "stage_started" and "stage_finished"
+    events; the latter carry the stage's seconds and its result or error,
+    so callers can surface partial results before the whole graph is done.
+    """
+    def notify(event: dict) -> None:
+        if on_event is None:
+            return
+        try:
+            on_event(event)
+        except Exception:
+            traceback.print_exc()
+
+    for name, (deps, _) in stages.items():
+        unknown = [d for d in deps if d not in stages]
+        if unknown:
+            raise ValueError(f"Stage '{name}' depends on unknown stages: {unknown}")
+
+    results: dict[str, object] = {}
+    errors: dict[str, str] = {}
+    timings: dict[str, float] = {}
+    pending = dict(stages)
+    running = {}
+
+    def timed(name, fn, inputs):
+        start = time.perf_counter()
+        try:
+            return fn(inputs)
+        finally:
+            timings[name] = time.perf_counter() - start
+
+    with ThreadPoolExecutor(max_workers=max_workers or len(stages), thread_name_prefix="specter-stage") as pool:
+        while pending or running:
+            finished = results.keys() | errors.keys()
+            ready = [name for name, (deps, _) in pending.items() if all(d in finished for d in deps)]
+            for name in ready:
+                deps, fn = pending.pop(name)
+                inputs = {d: results.get(d) for d in deps}
+                notify({"type": "stage_started", "stage": name})
+                # Stages see the caller's context (e.g. the job workspace)
+                context = contextvars.copy_context()
+                running[pool.submit(context.run, timed, name, fn, inputs)] = name
+
+            if not running:
+                raise ValueError(f"Stages with circular dependencies: {list(pending)}")
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                try:
+                    results[name] = future.result()
+                except Exception as e:
+                    traceback.print_exc()
+                    errors[name] = str(e)
+                    notify({"type": "stage_finished", "stage": name, "seconds": timings.get(name), "error": errors[name]})
+                else:
+                    notify({"type": "stage_finished", "stage": name, "seconds": timings.get(name), "result": results[name]})
+
+    return results, errors, timings
@@ -0,0 +1,111 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # preprocessing is skipped, the raw upload is sent instead
+    Image = None
+
+# DeepSeek-OCR works on 1024px views (and 640px tiles in Gundam mode):
+# anything much larger is only upload time
+OCR_MAX_SIDE = int(os.getenv("SPECTER_OCR_MAX_SIDE", "1280"))
+OCR_JPEG_QUALITY = 85
+# Pixels at least this bright (0-255, after autocontrast) count as board
+BOARD_THRESHOLD = 170
+# Only crop if the detected board keeps at least this share of the image
+MIN_BOARD_AREA = 0.3
+
+_pool: ProcessPoolExecutor | None = None
+_pool_lock = threading.Lock()
+
+
+def _board_bbox(gray) -> tuple[int, int, int, int] | None:
+    """
+    Bounding box of the bright (whiteboard / paper) region of a grayscale
+    image, or None if it is too small to be trusted.
+    """
+    # Work on a thumbnail: the box only needs to be roughly right
+    small = gray.copy()
+    small.thumbnail((256, 256))
+    mask = ImageOps.autocontrast(small).point(lambda v: 255 if v >= BOARD_THRESHOLD else 0)
+    bbox = mask.getbbox()
+    if bbox is None:
+        return None
+
+    left, top, right, bottom = bbox
+    if (right - left) * (bottom - top) < MIN_BOARD_AREA * small.width * small.height:
+        return None
+
+    scale_x = gray.width / small.width
+    scale_y = gray.height / small.height
+    return (
+        int(left * scale_x),
+        int(top * scale_y),
+        min(int(right * scale_x) + 1, gray.width),
+        min(int(bottom * scale_y) + 1, gray.height),
+    )
+
+
+def _preprocess(image_path: str, output_path: str) -> str:
+    with Image.open(image_path) as img:
+        img = ImageOps.exif_transpose(img)  # camera orientation
+        gray = img.convert("L")
+
+    bbox = _board_bbox(gray)
+    if bbox is not None:
+        gray = gray.crop(bbox)
+
+    gray.thumbnail((OCR_MAX_SIDE, OCR_MAX_SIDE), Image.LANCZOS)
+    gray.save(output_path, "JPEG", quality=OCR_JPEG_QUALITY, optimize=True)
+    return output_path
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # By the first job the server runs many threads: forking it then
+            # could copy a lock some other thread holds. Workers are started
+            # from a clean single-threaded fork server instead.
+            _pool = ProcessPoolExecutor(
+                max_workers=int(os.getenv("SPECTER_PREPROCESS_WORKERS", "2")),
+                mp_context=multiprocessing.get_context("forkserver"),
+            )
+    return _pool
+
+
+def preprocess_image(image_path: str, output_path: str) -> str:
+    """
+    Auto-orient, crop to the whiteboard, convert to grayscale, downsample
+    to OCR_MAX_SIDE and re-encode as JPEG, in a worker process so image
+    decoding never competes with the server for the GIL. Returns the path
+    to send to OCR (the original one if preprocessing isn't possible).
+    """
+    return preprocess_images([image_path], [output_path])[0]
+
+
+def preprocess_images(image_paths: list[str], output_paths: list[str]) -> list[str]:
+    """
+    preprocess_image for several images at once, spread over the worker
+    processes. Returns the paths to send to OCR, in order.
+    """
+    if Image is None:
+        print("Pillow is not installed, sending the raw images to OCR")
+        return list(image_paths)
+
+    try:
+        pool = _get_pool()
+        futures = [pool.submit(_preprocess, src, dst) for src, dst in zip(image_paths, output_paths)]
+    except Exception as e:
+        print("Image preprocessing failed, sending the raw images:", e)
+        return list(image_paths)
+    results = []
+    for image_path, future in zip(image_paths, futures):
+        try:
+            results.append(future.result())
+        except Exception as e:
+            print("Image preprocessing failed, sending the raw image:", e)
+            results.append(image_path)
+    return results
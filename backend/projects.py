@@ -0,0 +1,180 @@
+import json
+import os
+import re
+import shutil
+import threading
+import time
+
+from cache import make_key
+from manifest import scan_project
+from workspace import reap_directory
+
+# Latest structure, file fingerprints and files of every project, kept
+# across jobs so a re-run only regenerates what changed
+PROJECTS_ROOT = os.path.abspath(os.getenv("SPECTER_PROJECTS_ROOT", ".specter_projects"))
+# Every job saves its project, so saved projects not re-run for this
+# many seconds are deleted...
+PROJECT_TTL_SECONDS = int(os.getenv("SPECTER_PROJECT_TTL", str(7 * 24 * 3600)))
+# ...or earlier, least recently saved first, above this total size
+PROJECTS_QUOTA_BYTES = int(os.getenv("SPECTER_PROJECTS_QUOTA_MB", "1024")) << 20
+
+_PROJECT_ID_RE = re.compile(r"[A-Za-z0-9_-]{1,64}")
+_lock = threading.Lock()
+
+
+def is_valid_project_id(project_id: str) -> bool:
+    return bool(_PROJECT_ID_RE.fullmatch(project_id))
+
+
+def _project_dir(project_id: str) -> str:
+    if not is_valid_project_id(project_id):
+        raise ValueError(f"Invalid project id: {project_id!r}")
+    return os.path.join(PROJECTS_ROOT, project_id)
+
+
+def file_fingerprints(data: dict) -> dict[str, str]:
+    """
+    Fingerprint of every file in a parsed structure JSON: a hash of the
+    part of the structure that describes it (its path and description,
+    and the functions of its folder). A file whose fingerprint did not
+    change between two runs does not need to be regenerated.
+    """
+    fingerprints = {}
+    for folder_name, folder_content in data.items():
+        if not isinstance(folder_content, dict):
+            continue
+        functions = folder_content.get("functions", [])
+        for path, desc in folder_content.items():
+            if path == "functions" or not isinstance(desc, str):
+                continue
+            fingerprints[path] = make_key(path, desc, functions)
+    return fingerprints
+
+
+def diff_fingerprints(old: dict[str, str], new: dict[str, str]) -> tuple[list[str], list[str], list[str]]:
+    """
+    Returns (changed, unchanged, removed) paths; changed includes new files.
+    """
+    changed = [path for path, fp in new.items() if old.get(path) != fp]
+    unchanged = [path for path, fp in new.items() if old.get(path) == fp]
+    removed = [path for path in old if path not in new]
+    return changed, unchanged, removed
+
+
+def load_project(project_id: str) -> dict | None:
+    """
+    Saved state of a project: {"structure_json", "fingerprints",
+    "updated_at"}, or None if it was never generated.
+    """
+    try:
+        with open(os.path.join(_project_dir(project_id), "state.json"), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def restore_files(project_id: str, target_root: str, keep: list[str], drop: list[str]) -> list[str]:
+    """
+    Copy a project's whole saved tree into target_root (the job
+    workspace), including files its structure doesn't list (package.json,
+    configs, ...), then delete the drop paths (files to regenerate or
+    removed from the structure). Returns the keep paths that were not in
+    the saved tree.
+    """
+    files_dir = os.path.join(_project_dir(project_id), "files")
+    target_root = os.path.abspath(target_root)
+    with _lock:
+        if os.path.isdir(files_dir):
+            shutil.copytree(files_dir, target_root, dirs_exist_ok=True)
+
+    for path in drop:
+        target = os.path.normpath(os.path.join(target_root, path))
+        if os.path.commonpath([target_root, target]) == target_root and os.path.isfile(target):
+            os.remove(target)
+    return [path for path in keep if not os.path.isfile(os.path.join(target_root, path))]
+
+
+def read_project_files(source_root: str, project_root: str, max_bytes: int) -> dict[str, str] | None:
+    """
+    Text of every file under source_root/project_root, keyed by path
+    relative to source_root. None if the project is larger than max_bytes
+    or contains a file that isn't UTF-8 text.
+    """
+    manifest = scan_project(os.path.join(source_root, project_root))
+    if manifest["stats"]["bytes"] > max_bytes:
+        return None
+
+    files = {}
+    for entry in manifest["files"]:
+        path = f"{project_root}/{entry['path']}"
+        try:
+            with open(os.path.join(source_root, path), "r", encoding="utf-8", newline="") as f:
+                files[path] = f.read()
+        except UnicodeDecodeError:
+            return None
+    return files
+
+
+def write_project_files(files: dict[str, str], target_root: str) -> list[str]:
+    """
+    Write files returned by read_project_files under target_root (the job
+    workspace). Returns the paths written.
+    """
+    target_root = os.path.abspath(target_root)
+    written = []
+    for path, content in files.items():
+        target = os.path.normpath(os.path.join(target_root, path))
+        if os.path.commonpath([target_root, target]) != target_root:
+            raise ValueError(f"Path '{path}' is outside the workspace.")
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with open(target, "w", encoding="utf-8", newline="") as f:
+            f.write(content)
+        written.append(path)
+    return written
+
+
+def save_project(
+    project_id: str,
+    structure_json_str: str,
+    source_root: str,
+    project_root: str,
+    structure: dict | None = None,
+) -> None:
+    """
+    Save a generated project (structure, fingerprints and a copy of the
+    files under source_root/project_root) as the project's new state.
+    structure: structure_json_str already parsed, if the caller has it.
+    """
+    data = structure if structure is not None else json.loads(structure_json_str)
+    project_dir = _project_dir(project_id)
+    os.makedirs(project_dir, exist_ok=True)
+
+    with _lock:
+        # Copy next to the old state, then swap, so a failed copy keeps it
+        tmp_files = os.path.join(project_dir, f"files.{threading.get_ident()}.tmp")
+        shutil.rmtree(tmp_files, ignore_errors=True)
+        shutil.copytree(os.path.join(source_root, project_root), os.path.join(tmp_files, project_root))
+
+        files_dir = os.path.join(project_dir, "files")
+        shutil.rmtree(files_dir, ignore_errors=True)
+        os.replace(tmp_files, files_dir)
+
+        state = {
+            "structure_json": structure_json_str,
+            "fingerprints": file_fingerprints(data),
+            "updated_at": time.time(),
+        }
+        tmp_state = os.path.join(project_dir, "state.json.tmp")
+        with open(tmp_state, "w", encoding="utf-8") as f:
+            json.dump(state, f, ensure_ascii=False)
+        os.replace(tmp_state, os.path.join(project_dir, "state.json"))
+        os.utime(project_dir)  # the TTL counts from the last save
+
+
+def reap_projects() -> None:
+    """
+    Delete saved projects past PROJECT_TTL_SECONDS or over
+    PROJECTS_QUOTA_BYTES; a later run of one regenerates it in full.
+    """
+    with _lock:
+        reap_directory(PROJECTS_ROOT, PROJECT_TTL_SECONDS, PROJECTS_QUOTA_BYTES)
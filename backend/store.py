@@ -0,0 +1,65 @@
+import os
+import sqlite3
+import time
+from contextlib import closing
+
+# Local SQLite database holding per-job results
+DB_PATH = os.getenv("SPECTER_DB", ".specter_results.db")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS competition_analyses (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_id TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    content TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_competition_analyses_job_id ON competition_analyses (job_id);
+"""
+
+
+def _connect() -> sqlite3.Connection:
+    conn = sqlite3.connect(DB_PATH, timeout=30)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def init_db() -> None:
+    with closing(_connect()) as conn:
+        conn.execute("PRAGMA journal_mode=WAL")  # readers don't block the writing jobs
+        conn.executescript(_SCHEMA)
+
+
+def save_competition_analysis(job_id: str, content: str) -> int:
+    """
+    Store one competition analysis for a job and return its record id.
+    """
+    with closing(_connect()) as conn, conn:
+        cur = conn.execute(
+            "INSERT INTO competition_analyses (job_id, created_at, content) VALUES (?, ?, ?)",
+            (job_id, time.time(), content),
+        )
+        return cur.lastrowid
+
+
+def get_competition_analyses(job_id: str) -> list[dict]:
+    """
+    All analyses saved for a job, oldest first.
+    """
+    with closing(_connect()) as conn:
+        rows = conn.execute(
+            "SELECT id, job_id, created_at, content FROM competition_analyses WHERE job_id = ? ORDER BY id",
+            (job_id,),
+        ).fetchall()
+    return [dict(row) for row in rows]
+
+
+def latest_competition_analysis(job_id: str) -> str | None:
+    with closing(_connect()) as conn:
+        row = conn.execute(
+            "SELECT content FROM competition_analyses WHERE job_id = ? ORDER BY id DESC LIMIT 1",
+            (job_id,),
+        ).fetchone()
+    return row["content"] if row else None
+
+
+init_db()
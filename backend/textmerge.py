@@ -0,0 +1,65 @@
+import re
+
+# Lines with at least this many words are compared fuzzily; shorter ones
+# (headings, single words) only count as duplicates when identical
+MIN_FUZZY_WORDS = 4
+# Word-set overlap (Jaccard) above which two lines are the same region
+DUPLICATE_SIMILARITY = 0.8
+
+
+def _normalize_line(line: str) -> str:
+    # Markdown markers, punctuation and case vary between two OCR passes
+    return " ".join(re.sub(r"[^\w\s]", " ", line.lower()).split())
+
+
+def merge_ocr_texts(texts: list[str]) -> str:
+    """
+    Merge the OCR text of several boards, in order. A line already seen on
+    an earlier board (the same sticky note photographed twice, or the
+    overlapping edge of two photos) is dropped, and so is a board with
+    nothing new. Each remaining board is headed "Board N".
+    """
+    if len(texts) == 1:
+        return texts[0].strip()
+
+    seen_exact: set[str] = set()
+    seen_words: list[set[str]] = []
+
+    def is_duplicate(normalized: str) -> bool:
+        if normalized in seen_exact:
+            return True
+        words = set(normalized.split())
+        if len(words) < MIN_FUZZY_WORDS:
+            return False
+        for other in seen_words:
+            if len(words & other) / len(words | other) >= DUPLICATE_SIMILARITY:
+                return True
+        return False
+
+    sections = []
+    for number, text in enumerate(texts, start=1):
+        kept = []
+        new_exact, new_words = [], []
+        for line in text.strip().splitlines():
+            normalized = _normalize_line(line)
+            if not normalized:
+                if kept and kept[-1]:
+                    kept.append("")
+                continue
+            if is_duplicate(normalized):
+                continue
+            kept.append(line.rstrip())
+            new_exact.append(normalized)
+            words = set(normalized.split())
+            if len(words) >= MIN_FUZZY_WORDS:
+                new_words.append(words)
+
+        # Lines repeated within one board are kept: only other boards count
+        seen_exact.update(new_exact)
+        seen_words.extend(new_words)
+
+        body = "\n".join(kept).strip()
+        if body:
+            sections.append(f"Board {number}:\n{body}")
+
+    return "\n\n".join(sections)
@@ -0,0 +1,109 @@
+import hashlib
+import os
+
+from fastapi import HTTPException, UploadFile
+from starlette.concurrency import run_in_threadpool
+
+from cache import remember_file_hash
+
+# Uploads are copied to the job workspace this many bytes at a time, so a
+# request never holds more than one chunk of a file in memory
+UPLOAD_CHUNK_SIZE = 1 << 20
+MAX_IMAGE_BYTES = int(os.getenv("SPECTER_MAX_IMAGE_MB", "20")) << 20
+MAX_AUDIO_BYTES = int(os.getenv("SPECTER_MAX_AUDIO_MB", "100")) << 20
+# Session archives sent to /batches
+MAX_ARCHIVE_BYTES = int(os.getenv("SPECTER_MAX_BATCH_MB", "2048")) << 20
+# Photos accepted in one /process request
+MAX_IMAGES = int(os.getenv("SPECTER_MAX_IMAGES", "10"))
+# Whole /process request: all files plus multipart overhead
+MAX_REQUEST_BYTES = MAX_IMAGES * MAX_IMAGE_BYTES + MAX_AUDIO_BYTES + (1 << 20)
+
+
+def _is_image(head: bytes) -> bool:
+    return (
+        head.startswith(b"\xff\xd8\xff")                            # JPEG
+        or head.startswith(b"\x89PNG\r\n\x1a\n")
+        or head[:6] in (b"GIF87a", b"GIF89a")
+        or (head[:4] == b"RIFF" and head[8:12] == b"WEBP")
+        or head[:4] in (b"II*\x00", b"MM\x00*")                     # TIFF
+        or head.startswith(b"BM")
+        or (head[4:8] == b"ftyp" and head[8:12] in (b"heic", b"heix", b"mif1", b"avif"))
+    )
+
+
+def _is_audio(head: bytes) -> bool:
+    return (
+        (head[:4] == b"RIFF" and head[8:12] == b"WAVE")
+        or head.startswith(b"\x1aE\xdf\xa3")                        # WebM (browser recordings)
+        or head.startswith(b"OggS")
+        or head.startswith(b"fLaC")
+        or head.startswith(b"ID3")                                  # MP3 with tags
+        or (len(head) > 1 and head[0] == 0xFF and head[1] & 0xE0 == 0xE0)  # MP3 / AAC frames
+        or head[4:8] == b"ftyp"                                     # MP4 / M4A
+        or (head[:4] == b"FORM" and head[8:12] in (b"AIFF", b"AIFC"))
+    )
+
+
+def _is_zip(head: bytes) -> bool:
+    return head.startswith(b"PK\x03\x04")
+
+
+# kind -> (size limit, content check on the first bytes)
+UPLOAD_KINDS = {
+    "image": (MAX_IMAGE_BYTES, _is_image),
+    "audio": (MAX_AUDIO_BYTES, _is_audio),
+    "archive": (MAX_ARCHIVE_BYTES, _is_zip),
+}
+
+
+def sniff_kind(head: bytes) -> str | None:
+    """
+    "image" or "audio" from the first bytes of a file, else None.
+    """
+    if _is_image(head):
+        return "image"
+    if _is_audio(head):
+        return "audio"
+    return None
+
+
+def _remove(path: str) -> None:
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+async def save_upload(upload: UploadFile, kind: str, path: str) -> dict:
+    """
+    Stream an upload to path in UPLOAD_CHUNK_SIZE chunks, hashing it on the
+    way. An upload that is too large (413), empty (400) or whose first
+    bytes are not an image / audio file (415) is rejected as soon as that
+    is known. Returns {"size", "sha256"}.
+    """
+    max_bytes, looks_valid = UPLOAD_KINDS[kind]
+    if upload.size is not None and upload.size > max_bytes:
+        raise HTTPException(status_code=413, detail=f"The {kind} is larger than {max_bytes >> 20} MB.")
+
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with open(path, "wb") as f:
+            while chunk := await upload.read(UPLOAD_CHUNK_SIZE):
+                if size == 0 and not looks_valid(chunk[:16]):
+                    raise HTTPException(status_code=415, detail=f"Unsupported {kind} format.")
+                size += len(chunk)
+                if size > max_bytes:
+                    raise HTTPException(status_code=413, detail=f"The {kind} is larger than {max_bytes >> 20} MB.")
+                digest.update(chunk)
+                await run_in_threadpool(f.write, chunk)
+        if size == 0:
+            raise HTTPException(status_code=400, detail=f"The {kind} upload is empty.")
+    except BaseException:
+        _remove(path)
+        raise
+
+    sha256 = digest.hexdigest()
+    # Cache keys of this input won't need to read it again
+    remember_file_hash(path, sha256)
+    return {"size": size, "sha256": sha256}
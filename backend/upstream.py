@@ -0,0 +1,347 @@
+import asyncio
+import os
+import random
+import threading
+import time
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from contextlib import contextmanager
+
+from metrics import record_upstream_event
+
+
+def _env(name: str, key: str, default):
+    value = os.getenv(f"SPECTER_{name.upper()}_{key}")
+    if value is None:
+        return default
+    return type(default)(value) if default is not None else float(value)
+
+
+# Per external service:
+# - rate / burst: token bucket, in calls per second. The rate adapts: it is
+#   halved on every failure and creeps back up on successes.
+# - limit: calls in flight across all jobs (None: bounded elsewhere, e.g.
+#   the Spaces by their client pools).
+# - timeout: seconds per attempt; deadline: seconds for the whole call,
+#   retries and backoff included (None: unbounded).
+# - retries: extra attempts after a failure, with jittered exponential backoff.
+# - failures / cooldown: consecutive failures that open the circuit breaker,
+#   and how long it then fails fast before letting a trial call through.
+UPSTREAM_DEFAULTS = {
+    # One chat completion of an agent (see rate_limit_llm in agent.py)
+    "llm": dict(rate=5.0, burst=10, limit=int(os.getenv("SPECTER_LIMIT_LLM", "8")), timeout=120.0, deadline=300.0, retries=2, failures=5, cooldown=60.0),
+    "ocr": dict(rate=2.0, burst=4, limit=None, timeout=120.0, deadline=300.0, retries=2, failures=5, cooldown=60.0),
+    "whisper": dict(rate=4.0, burst=8, limit=None, timeout=120.0, deadline=300.0, retries=2, failures=5, cooldown=60.0),
+    "kimi": dict(rate=2.0, burst=4, limit=None, timeout=180.0, deadline=360.0, retries=2, failures=5, cooldown=60.0),
+    "tavily": dict(rate=5.0, burst=5, limit=int(os.getenv("SPECTER_LIMIT_TAVILY", "4")), timeout=20.0, deadline=45.0, retries=2, failures=5, cooldown=60.0),
+    # Every site is a different server: no shared breaker
+    "web": dict(rate=20.0, burst=20, limit=None, timeout=15.0, deadline=25.0, retries=1, failures=None, cooldown=0.0),
+}
+UPSTREAMS = {
+    name: {key: _env(name, key.upper(), default) for key, default in config.items()}
+    for name, config in UPSTREAM_DEFAULTS.items()
+}
+# Backoff before retry n (0-based) is uniform in [0, BACKOFF_BASE * 2**n]
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 20.0
+# Errors the caller caused (bad input, a missing page): failed at once,
+# without counting against the upstream
+NON_RETRYABLE = (ValueError, TypeError, KeyError)
+
+
+class UpstreamError(RuntimeError):
+    pass
+
+
+class CircuitOpenError(UpstreamError):
+    pass
+
+
+class DeadlineExceeded(UpstreamError):
+    pass
+
+
+class TokenBucket:
+    """
+    Token bucket whose refill rate adapts to the upstream: halved on each
+    failure (down to a tenth of the configured rate), raised by a
+    twentieth of it on each success.
+    """
+
+    def __init__(self, rate: float, burst: int):
+        self.max_rate = rate
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, deadline: float | None) -> None:
+        """
+        Take a token, waiting for one until the deadline (time.monotonic()).
+        """
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            if deadline is not None and now + wait > deadline:
+                raise DeadlineExceeded("deadline reached while rate limited")
+            time.sleep(wait)
+
+    def penalize(self) -> None:
+        with self._lock:
+            self.rate = max(self.rate / 2, self.max_rate / 10)
+
+    def reward(self) -> None:
+        with self._lock:
+            self.rate = min(self.rate + self.max_rate / 20, self.max_rate)
+
+
+class CircuitBreaker:
+    """
+    Opens after `failures` consecutive failures and rejects calls for
+    `cooldown` seconds, then lets one trial call through: its success
+    closes the circuit, its failure opens it again.
+    """
+
+    def __init__(self, failures: int | None, cooldown: float):
+        self.failures = failures
+        self.cooldown = cooldown
+        self.consecutive = 0
+        self.opened_at: float | None = None
+        self.trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at < self.cooldown:
+            return "open"
+        return "half_open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half_open" and not self.trial_running:
+                self.trial_running = True
+                return True
+            return False
+
+    def cancel_trial(self) -> None:
+        with self._lock:
+            self.trial_running = False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.consecutive = 0
+            self.opened_at = None
+            self.trial_running = False
+
+    def record_failure(self) -> bool:
+        """
+        Returns True if this failure opened the circuit.
+        """
+        with self._lock:
+            self.consecutive += 1
+            was_trial = self.trial_running
+            self.trial_running = False
+            if self.failures is None:
+                return False
+            if was_trial or (self.opened_at is None and self.consecutive >= self.failures):
+                self.opened_at = time.monotonic()
+                return True
+            return False
+
+
+_buckets = {name: TokenBucket(config["rate"], int(config["burst"])) for name, config in UPSTREAMS.items()}
+_breakers = {name: CircuitBreaker(config["failures"], config["cooldown"]) for name, config in UPSTREAMS.items()}
+_semaphores = {
+    name: threading.BoundedSemaphore(int(config["limit"]))
+    for name, config in UPSTREAMS.items() if config["limit"]
+}
+_lock = threading.Lock()
+_in_flight = {name: 0 for name in UPSTREAMS}
+_waiting = {name: 0 for name in UPSTREAMS}
+
+
+def _acquire_slot(name: str) -> None:
+    semaphore = _semaphores.get(name)
+    with _lock:
+        _waiting[name] += 1
+    if semaphore is not None:
+        semaphore.acquire()
+    with _lock:
+        _waiting[name] -= 1
+        _in_flight[name] += 1
+
+
+def _release_slot(name: str) -> None:
+    with _lock:
+        _in_flight[name] -= 1
+    semaphore = _semaphores.get(name)
+    if semaphore is not None:
+        semaphore.release()
+
+
+@contextmanager
+def upstream_slot(name: str):
+    """
+    Hold one of an upstream's concurrency slots for the duration of a
+    call, blocking while all of them are taken. Jobs can then run with
+    more parallelism than any single upstream allows: they queue on the
+    resource they need instead of holding a job worker.
+    """
+    _acquire_slot(name)
+    try:
+        yield
+    finally:
+        _release_slot(name)
+
+
+def is_available(name: str) -> bool:
+    """
+    False while the upstream's circuit is open, so callers can skip
+    optional work instead of waiting for it to fail.
+    """
+    return _breakers[name].state != "open"
+
+
+def _admit(name: str) -> None:
+    if not _breakers[name].allow():
+        record_upstream_event(name, "rejected")
+        raise CircuitOpenError(f"{name} is unavailable (circuit open), try again later")
+
+
+def _attempt_timeout(name: str, deadline: float | None) -> float | None:
+    timeout = UPSTREAMS[name]["timeout"]
+    if deadline is not None:
+        timeout = min(timeout or float("inf"), deadline - time.monotonic())
+        if timeout <= 0:
+            raise DeadlineExceeded("deadline reached")
+    return timeout
+
+
+def _record_success(name: str) -> None:
+    _buckets[name].reward()
+    _breakers[name].record_success()
+
+
+def _record_failure(name: str, e: Exception, attempt: int, deadline: float | None) -> float | None:
+    """
+    Account for a failed attempt. Returns how long to back off before the
+    next one, or None when the error must be raised.
+    """
+    breaker = _breakers[name]
+    if isinstance(e, DeadlineExceeded):
+        # Waiting on our own rate limit says nothing about the upstream
+        breaker.cancel_trial()
+        record_upstream_event(name, "deadline")
+        return None
+    if isinstance(e, NON_RETRYABLE):
+        # The caller's fault (a 404, bad input): says nothing about the
+        # upstream's health, so neither the rate nor the breaker change
+        breaker.cancel_trial()
+        record_upstream_event(name, "rejected_input")
+        return None
+
+    timed_out = isinstance(e, (TimeoutError, FutureTimeoutError))
+    record_upstream_event(name, "timeout" if timed_out else "failure")
+    _buckets[name].penalize()
+    if breaker.record_failure():
+        record_upstream_event(name, "circuit_opened")
+        print(f"Circuit opened for {name} after {breaker.consecutive} failures: {e}")
+
+    if attempt >= UPSTREAMS[name]["retries"]:
+        return None
+    backoff = random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+    if deadline is not None and time.monotonic() + backoff >= deadline:
+        return None
+    record_upstream_event(name, "retry")
+    return backoff
+
+
+def _deadline(name: str) -> float | None:
+    seconds = UPSTREAMS[name]["deadline"]
+    return time.monotonic() + seconds if seconds else None
+
+
+def call_upstream(name: str, fn):
+    """
+    Call fn(timeout) against an upstream: fail fast while its circuit is
+    open, then for each attempt take a rate-limit token and a concurrency
+    slot and give fn the seconds it has left (None if unbounded). Failed
+    attempts are retried with jittered exponential backoff while the
+    deadline allows. fn must enforce timeout itself.
+    """
+    deadline = _deadline(name)
+    attempt = 0
+    while True:
+        _admit(name)
+        try:
+            _buckets[name].acquire(deadline)
+            with upstream_slot(name):
+                result = fn(_attempt_timeout(name, deadline))
+        except Exception as e:
+            backoff = _record_failure(name, e, attempt, deadline)
+            if backoff is None:
+                raise
+            attempt += 1
+            time.sleep(backoff)
+            continue
+        _record_success(name)
+        return result
+
+
+async def acall_upstream(name: str, fn):
+    """
+    call_upstream for coroutines: fn(timeout) returns an awaitable, which
+    is cancelled once the timeout is reached. Waiting for a token or a
+    slot happens in a worker thread, so the event loop stays free.
+    """
+    deadline = _deadline(name)
+    attempt = 0
+    while True:
+        _admit(name)
+        try:
+            await asyncio.to_thread(_buckets[name].acquire, deadline)
+            await asyncio.to_thread(_acquire_slot, name)
+            try:
+                timeout = _attempt_timeout(name, deadline)
+                result = await asyncio.wait_for(fn(timeout), timeout)
+            finally:
+                _release_slot(name)
+        except Exception as e:
+            backoff = _record_failure(name, e, attempt, deadline)
+            if backoff is None:
+                raise
+            attempt += 1
+            await asyncio.sleep(backoff)
+            continue
+        _record_success(name)
+        return result
+
+
+def upstream_stats() -> dict:
+    with _lock:
+        in_flight = dict(_in_flight)
+        waiting = dict(_waiting)
+    return {
+        name: {
+            "limit": config["limit"],
+            "in_flight": in_flight[name],
+            "waiting": waiting[name],
+            "rate": round(_buckets[name].rate, 3),
+            "circuit": _breakers[name].state,
+        }
+        for name, config in UPSTREAMS.items()
+    }
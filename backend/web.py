@@ -0,0 +1,236 @@
+import codecs
+import contextvars
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from html.parser import HTMLParser
+from urllib.parse import urlsplit, urlunsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from tavily import TavilyClient
+
+from cache import ResultCache, make_key
+from metrics import record_bytes, span
+from upstream import call_upstream
+
+# Pages are cut to this many characters of text before reaching the agent
+MAX_PAGE_CHARS = 5000
+# Hard cap on bytes downloaded per page, whatever its text yields
+MAX_PAGE_BYTES = 1 << 20
+# Start of the text scrape_many() returns for a page it couldn't fetch
+SCRAPE_ERROR_PREFIX = "Error scraping website: "
+# (connect, read) timeouts in seconds
+FETCH_TIMEOUT = (5, 10)
+# Pages fetched at the same time by scrape_many()
+FETCH_WORKERS = int(os.getenv("SPECTER_FETCH_WORKERS", "8"))
+
+# Competitors and their homepages don't change by the minute: repeat
+# analyses in the same market reuse earlier searches and page text
+SEARCH_TTL_SECONDS = int(os.getenv("SPECTER_SEARCH_TTL", str(24 * 3600)))
+PAGE_TTL_SECONDS = int(os.getenv("SPECTER_PAGE_TTL", str(7 * 24 * 3600)))
+search_cache = ResultCache("search", max_entries=512, ttl_seconds=SEARCH_TTL_SECONDS)
+page_cache = ResultCache("pages", max_entries=512, max_disk_bytes=128 << 20, ttl_seconds=PAGE_TTL_SECONDS)
+
+_session = requests.Session()
+_session.mount("http://", HTTPAdapter(pool_connections=16, pool_maxsize=FETCH_WORKERS))
+_session.mount("https://", HTTPAdapter(pool_connections=16, pool_maxsize=FETCH_WORKERS))
+_session.headers.update({"User-Agent": "Mozilla/5.0 (compatible; SpecterBot/1.0)"})
+
+_fetch_pool = ThreadPoolExecutor(max_workers=FETCH_WORKERS, thread_name_prefix="specter-fetch")
+
+_tavily_client: TavilyClient | None = None
+_tavily_lock = threading.Lock()
+
+
+class _TextExtractor(HTMLParser):
+    """
+    Incremental HTML-to-text parser. It keeps no tree, skips non-visible
+    elements and reports when enough text has been collected, so the
+    download can stop there.
+    """
+
+    # Not "head": pages may leave it unclosed, and what it holds besides
+    # these has no text anyway
+    SKIP_TAGS = {"script", "style", "noscript", "template", "svg", "title", "nav", "footer"}
+    # Tags starting a new line of text
+    BLOCK_TAGS = {
+        "p", "div", "section", "article", "header", "main", "aside", "li", "ul", "ol", "table", "tr",
+        "h1", "h2", "h3", "h4", "h5", "h6", "br", "blockquote", "pre", "dt", "dd",
+    }
+
+    def __init__(self, max_chars: int):
+        super().__init__(convert_charrefs=True)
+        self.max_chars = max_chars
+        self.parts: list[str] = []
+        self.length = 0
+        self._skip_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "body":
+            # Whatever was left unclosed before the body, its text is visible
+            self._skip_depth = 0
+        elif tag in self.SKIP_TAGS:
+            self._skip_depth += 1
+        elif tag in self.BLOCK_TAGS:
+            self.parts.append("\n")
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIP_TAGS and self._skip_depth:
+            self._skip_depth -= 1
+        elif tag in self.BLOCK_TAGS:
+            self.parts.append("\n")
+
+    def handle_data(self, data):
+        if self._skip_depth or self.done:
+            return
+        data = data.strip()
+        if data:
+            self.parts.append(data)
+            self.length += len(data) + 1
+
+    @property
+    def done(self) -> bool:
+        return self.length >= self.max_chars
+
+    def text(self) -> str:
+        """
+        The visible text, one line per block element.
+        """
+        lines = (" ".join(line.split()) for line in " ".join(self.parts).split("\n"))
+        return "\n".join(line for line in lines if line)[: self.max_chars]
+
+
+def normalize_query(query: str) -> str:
+    """
+    Lowercase, drop punctuation and collapse whitespace, so trivially
+    different phrasings of a query share a cache entry.
+    """
+    return " ".join(re.sub(r"[^\w\s]", " ", query.lower()).split())
+
+
+def normalize_url(url: str) -> str:
+    parts = urlsplit(url.strip())
+    path = parts.path.rstrip("/") or "/"
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path, parts.query, ""))
+
+
+def fetch_page_text(url: str, max_chars: int = MAX_PAGE_CHARS) -> str:
+    """
+    Visible text of a page, from the page cache if it was scraped recently.
+    """
+    key = make_key(normalize_url(url), max_chars)
+    cached = page_cache.get(key)
+    if cached is not None:
+        return cached
+
+    with span("upstream", "web"):
+        text = call_upstream("web", lambda timeout: _download_page_text(url, max_chars, timeout))
+    page_cache.set(key, text)
+    return text
+
+
+def _page_encoding(content_type: str, head: bytes) -> str:
+    """
+    Charset of a page: from the Content-Type header, else from a <meta>
+    tag in its first bytes, else UTF-8.
+    """
+    match = re.search(r"charset=[\"']?([\w.:-]+)", content_type, re.IGNORECASE)
+    if match is None:
+        match = re.search(rb"<meta[^>]+charset=[\"']?([\w.:-]+)", head[:4096], re.IGNORECASE)
+    if match is not None:
+        encoding = match.group(1)
+        if isinstance(encoding, bytes):
+            encoding = encoding.decode("ascii")
+        try:
+            return codecs.lookup(encoding).name
+        except LookupError:
+            pass
+    return "utf-8"
+
+
+def _download_page_text(url: str, max_chars: int, timeout: float) -> str:
+    """
+    Download a page through the shared session and return its visible
+    text, reading the body in chunks and stopping as soon as max_chars of
+    text (or MAX_PAGE_BYTES of body) have been read. A page still
+    arriving after timeout seconds is abandoned.
+    """
+    deadline = time.monotonic() + timeout
+    connect_timeout, read_timeout = FETCH_TIMEOUT
+    with _session.get(url, stream=True, timeout=(min(connect_timeout, timeout), min(read_timeout, timeout))) as response:
+        if 400 <= response.status_code < 500 and response.status_code not in (408, 429):
+            # Retrying won't make the page exist
+            raise ValueError(f"{response.status_code} Client Error for url: {url}")
+        response.raise_for_status()
+        content_type = response.headers.get("Content-Type", "")
+        if content_type and "html" not in content_type and "text" not in content_type:
+            raise ValueError(f"Unsupported content type: {content_type}")
+
+        parser = _TextExtractor(max_chars)
+        decoder = None
+        received = 0
+        for chunk in response.iter_content(chunk_size=16 * 1024):
+            received += len(chunk)
+            if decoder is None:
+                encoding = _page_encoding(content_type, chunk)
+                decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+            # Incremental, so a character split between two chunks survives
+            parser.feed(decoder.decode(chunk))
+            if parser.done or received >= MAX_PAGE_BYTES:
+                break
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"{url} took longer than {timeout:.0f}s")
+        if decoder is not None:
+            parser.feed(decoder.decode(b"", final=True))
+        record_bytes("web", "in", received)
+        return parser.text()
+
+
+def scrape_many(urls: list[str], max_chars: int = MAX_PAGE_CHARS) -> list[tuple[str, str]]:
+    """
+    Fetch several pages concurrently. Returns (url, text or error message)
+    pairs in the order of urls.
+    """
+    def fetch(url: str) -> str:
+        try:
+            return fetch_page_text(url, max_chars)
+        except Exception as e:
+            return f"{SCRAPE_ERROR_PREFIX}{e}"
+
+    # Each fetch runs in the caller's context, so it counts towards its job
+    futures = [_fetch_pool.submit(contextvars.copy_context().run, fetch, url) for url in urls]
+    return [(url, future.result()) for url, future in zip(urls, futures)]
+
+
+def get_tavily_client() -> TavilyClient:
+    global _tavily_client
+    if _tavily_client is None:
+        with _tavily_lock:
+            if _tavily_client is None:
+                _tavily_client = TavilyClient(api_key=os.getenv("TAVILY_API_KEY"))
+    return _tavily_client
+
+
+def search_urls(query: str) -> list[str]:
+    """
+    URLs of the Tavily results for a query, cached per normalized query.
+    """
+    key = make_key(normalize_query(query))
+    cached = search_cache.get(key)
+    if cached is not None:
+        return cached
+
+    with span("upstream", "tavily"):
+        response = call_upstream(
+            "tavily", lambda timeout: get_tavily_client().search(query, timeout=max(1, int(timeout)))
+        )
+    urls = [result.get("url") for result in response.get("results", [])]
+    search_cache.set(key, urls)
+    return urls
+
+
+def cache_stats() -> dict:
+    return {"search": search_cache.stats(), "pages": page_cache.stats()}
@@ -0,0 +1,131 @@
+import contextvars
+import os
+import shutil
+import threading
+import time
+import uuid
+
+# Every job gets its own scratch directory under this root
+WORKSPACE_ROOT = os.path.abspath(os.getenv("SPECTER_WORKSPACE_ROOT", ".specter_jobs"))
+
+# Finished workspaces are deleted after this many seconds...
+WORKSPACE_TTL_SECONDS = int(os.getenv("SPECTER_WORKSPACE_TTL", "3600"))
+# ...or earlier, oldest first, when all of them together exceed this size
+WORKSPACE_QUOTA_BYTES = int(os.getenv("SPECTER_WORKSPACE_QUOTA_MB", "2048")) << 20
+REAP_INTERVAL_SECONDS = 60
+
+# Workspace of the job running in the current context. The file tools
+# resolve the paths the agents give them against it.
+current_workspace: contextvars.ContextVar[str | None] = contextvars.ContextVar("current_workspace", default=None)
+
+_active: set[str] = set()
+_lock = threading.Lock()
+
+
+def workspace_path(name: str) -> str:
+    return os.path.join(WORKSPACE_ROOT, name)
+
+
+def create_workspace(name: str | None = None) -> str:
+    """
+    Create a fresh workspace directory and return its absolute path.
+    It is protected from the reaper until release_workspace() is called.
+    """
+    path = workspace_path(name or uuid.uuid4().hex)
+    os.makedirs(path, exist_ok=True)
+    with _lock:
+        _active.add(path)
+    return path
+
+
+def release_workspace(path: str) -> None:
+    """
+    Mark a workspace as finished: from now on the TTL/quota reaper may
+    delete it.
+    """
+    with _lock:
+        _active.discard(path)
+    os.utime(path)  # TTL counts from the end of the job
+
+
+def resolve_path(path: str) -> str:
+    """
+    Resolve a path given to a tool against the current job workspace and
+    refuse paths escaping it. Outside of a job, paths are used as-is.
+    """
+    workspace = current_workspace.get()
+    if workspace is None:
+        return path
+
+    resolved = os.path.normpath(os.path.join(workspace, path))
+    if os.path.commonpath([workspace, resolved]) != workspace:
+        raise ValueError(f"Path '{path}' is outside of the job workspace.")
+    return resolved
+
+
+def _dir_size(path: str) -> int:
+    total = 0
+    for root, dirs, files in os.walk(path):
+        for filename in files:
+            try:
+                total += os.path.getsize(os.path.join(root, filename))
+            except OSError:
+                pass
+    return total
+
+
+def reap_directory(root: str, ttl_seconds: int, quota_bytes: int, protected: set[str] | None = None) -> None:
+    """
+    Delete the subdirectories of root older than ttl_seconds, then the
+    oldest ones while their total size is over quota_bytes. Protected
+    paths are never touched but count towards the quota.
+    """
+    if not os.path.isdir(root):
+        return
+
+    now = time.time()
+    protected = protected or set()
+    finished = []
+    total = 0
+    for entry in os.scandir(root):
+        if not entry.is_dir():
+            continue
+        size = _dir_size(entry.path)
+        total += size
+        if entry.path in protected:
+            continue
+        finished.append((entry.stat().st_mtime, size, entry.path))
+
+    finished.sort()
+    for mtime, size, path in finished:
+        if now - mtime <= ttl_seconds and total <= quota_bytes:
+            continue
+        shutil.rmtree(path, ignore_errors=True)
+        total -= size
+
+
+def reap_workspaces() -> None:
+    """
+    Delete expired workspaces, then the oldest finished ones while the
+    total size is over quota. Active workspaces are never touched.
+    """
+    with _lock:
+        active = set(_active)
+    reap_directory(WORKSPACE_ROOT, WORKSPACE_TTL_SECONDS, WORKSPACE_QUOTA_BYTES, active)
+
+
+def start_reaper(*reapers) -> None:
+    """
+    Reap workspaces, and anything else passed in reapers, every
+    REAP_INTERVAL_SECONDS.
+    """
+    def loop():
+        while True:
+            for reap in (reap_workspaces, *reapers):
+                try:
+                    reap()
+                except Exception as e:
+                    print(f"Reaper error ({reap.__name__}):", e)
+            time.sleep(REAP_INTERVAL_SECONDS)
+
+    threading.Thread(target=loop, name="specter-reaper", daemon=True).start()
@@ -6,6 +6,18 @@ import React, { useState, useEffect, useRef } from "react";
 
 const PIPELINE_STEPS = ["Extract", "Enrich", "Design", "Code"];
 
+const API_URL = "http://localhost:8000";
+
+// Pipeline step each backend stage belongs to (see the job event stream)
+const STAGE_STEPS = {
+  preprocess_image: "Extract",
+  extract_text: "Extract",
+  extract_audio: "Extract",
+  enrich: "Enrich",
+  competition: "Design",
+  creator: "Design",
+};
+
 export default function App() {
   const [selectedTab, setSelectedTab] = useState("overview");
   const [pipelineStep, setPipelineStep] = useState("idle");
@@ -20,8 +32,11 @@ export default function App() {
   const [code, setCode] = useState("");
 
   // New backend fields
-  const [zipBase64, setZipBase64] = useState("");
+  const [downloadUrl, setDownloadUrl] = useState("");
   const [projectRoot, setProjectRoot] = useState("");
+  // Re-runs send this back so the backend only regenerates changed files.
+  // New inputs start a new project.
+  const [projectId, setProjectId] = useState("");
   const [structureJson, setStructureJson] = useState("");
 
   const [competitionAnalysis, setCompetitionAnalysis] = useState("");
@@ -41,6 +56,7 @@ export default function App() {
     const url = URL.createObjectURL(file);
     setWhiteboardImage(url);
     setWhiteboardFile(file);
+    setProjectId("");
   };
 
   const handleAudioUpload = (e) => {
@@ -50,6 +66,7 @@ export default function App() {
     const url = URL.createObjectURL(file);
     setAudioUrl(url);
     setAudioFile(file);
+    setProjectId("");
   };
 
   const clearWhiteboardImage = () => {
@@ -71,15 +88,49 @@ export default function App() {
 
     const sleep = (ms) => new Promise((res) => setTimeout(res, ms));
 
-    // Animate the first steps (all except the last one)
-    const animatePipeline = async () => {
-      for (let i = 0; i < PIPELINE_STEPS.length - 1; i++) {
-        setPipelineStep(PIPELINE_STEPS[i]);
-        await sleep(600); // was 60000 (60s) before – way too long
-      }
-    };
+    // Only ever move the timeline forward, stages can finish out of order
+    const advanceStep = (step) =>
+      setPipelineStep((prev) =>
+        PIPELINE_STEPS.indexOf(step) > PIPELINE_STEPS.indexOf(prev) ? step : prev
+      );
+
+    // Follow the job's progress stream, showing partial results as soon as
+    // they are ready. Resolves with the final job status.
+    const followJob = (jobId) =>
+      new Promise((resolve) => {
+        const source = new EventSource(`${API_URL}/jobs/${jobId}/events`);
+
+        source.addEventListener("stage_started", (e) => {
+          const event = JSON.parse(e.data);
+          if (STAGE_STEPS[event.stage]) advanceStep(STAGE_STEPS[event.stage]);
+        });
+
+        source.addEventListener("stage_finished", (e) => {
+          const event = JSON.parse(e.data);
+          if (event.error) return;
+          if (event.stage === "enrich") setOverview(event.result || "");
+          if (event.stage === "competition") setCompetitionAnalysis(event.result || "");
+        });
+
+        source.addEventListener("file_written", (e) => {
+          const event = JSON.parse(e.data);
+          advanceStep("Code");
+          setCode((prev) => `${prev}${prev ? "\n" : ""}${event.path}`);
+        });
+
+        source.addEventListener("job_finished", (e) => {
+          source.close();
+          resolve(JSON.parse(e.data).status);
+        });
+
+        source.onerror = () => {
+          // EventSource retries by itself unless the stream is gone for good
+          if (source.readyState === EventSource.CLOSED) resolve("failed");
+        };
+      });
 
-    const animationPromise = animatePipeline();
+    setPipelineStep(PIPELINE_STEPS[0]);
+    setCode("");
 
     try {
       const formData = new FormData();
@@ -89,8 +140,11 @@ export default function App() {
       if (audioFile) {
         formData.append("audio", audioFile, audioName || "audio.webm");
       }
+      if (projectId) {
+        formData.append("project_id", projectId);
+      }
 
-      const res = await fetch("http://localhost:8000/process", {
+      const res = await fetch(`${API_URL}/process`, {
         method: "POST",
         body: formData,
       });
@@ -102,7 +156,19 @@ export default function App() {
         return;
       }
 
-      const data = await res.json();
+      // The backend queues the pipeline and hands back a job id to follow
+      const { job_id: jobId } = await res.json();
+      const status = await followJob(jobId);
+
+      const resultRes = await fetch(`${API_URL}/jobs/${jobId}/result`);
+      if (!resultRes.ok) {
+        console.error("Job failed", jobId, status);
+        alert("Backend error while processing.");
+        setPipelineStep("idle");
+        return;
+      }
+
+      const data = await resultRes.json();
 
       // Update UI from backend response
       setOverview(data.overview || "");
@@ -110,14 +176,13 @@ export default function App() {
       setCode(data.code || "");
 
       // New fields from backend
-      setZipBase64(data.zip_base64 || "");
+      setDownloadUrl(data.download_url ? `${API_URL}${data.download_url}` : "");
       setProjectRoot(data.project_root || "");
+      setProjectId(data.project_id || "");
       setStructureJson(data.structure_json || "");
 
       setCompetitionAnalysis(data.competition_analysis || "");
 
-      await animationPromise;
-
       const lastStep = PIPELINE_STEPS[PIPELINE_STEPS.length - 1]; // "Code"
       setPipelineStep(lastStep);
       await sleep(400);
@@ -162,7 +227,7 @@ export default function App() {
             overview={overview}
             architecture={architecture}
             code={code}
-            zipBase64={zipBase64}
+            downloadUrl={downloadUrl}
             projectRoot={projectRoot}
             competitionAnalysis={competitionAnalysis}
           />
@@ -180,6 +245,7 @@ export default function App() {
           const blob = await res.blob();
           const file = new File([blob], "webcam_capture.png", { type: blob.type });
           setWhiteboardFile(file);
+          setProjectId("");
 
           setShowWebcam(false);
         }}
@@ -192,6 +258,7 @@ export default function App() {
           setAudioName("Recorded audio");
           setAudioUrl(url);
           setAudioFile(blob);
+          setProjectId("");
           setShowAudioRecorder(false);
         }}
       />
@@ -441,7 +508,7 @@ function OutputPanel({
   overview,
   architecture,
   code,
-  zipBase64,
+  downloadUrl,
   projectRoot,
   competitionAnalysis,
 }) {
@@ -460,31 +527,18 @@ function OutputPanel({
   }[selectedTab];
 
   const handleDownloadZip = () => {
-    if (!zipBase64) {
+    if (!downloadUrl) {
       alert("No project archive available yet. Run the pipeline first.");
       return;
     }
 
-    try {
-      const byteChars = atob(zipBase64);
-      const byteNumbers = new Array(byteChars.length);
-      for (let i = 0; i < byteChars.length; i++) {
-        byteNumbers[i] = byteChars.charCodeAt(i);
-      }
-      const byteArray = new Uint8Array(byteNumbers);
-      const blob = new Blob([byteArray], { type: "application/zip" });
-      const url = URL.createObjectURL(blob);
-      const a = document.createElement("a");
-      a.href = url;
-      a.download = `${projectRoot || "project"}.zip`;
-      document.body.appendChild(a);
-      a.click();
-      a.remove();
-      URL.revokeObjectURL(url);
-    } catch (e) {
-      console.error("Failed to download ZIP:", e);
-      alert("Could not download ZIP file.");
-    }
+    // The backend streams the archive; let the browser download it directly
+    const a = document.createElement("a");
+    a.href = downloadUrl;
+    a.download = `${projectRoot || "project"}.zip`;
+    document.body.appendChild(a);
+    a.click();
+    a.remove();
   };
 
   return (
@@ -527,10 +581,10 @@ function OutputPanel({
           </button>
           <button
             className={`px-3 py-1 rounded-full border border-slate-700 hover:bg-slate-800 ${
-              !zipBase64 ? "opacity-50 cursor-not-allowed" : ""
+              !downloadUrl ? "opacity-50 cursor-not-allowed" : ""
             }`}
             onClick={handleDownloadZip}
-            disabled={!zipBase64}
+            disabled={!downloadUrl}
           >
             Download ZIP
           </button>